@@ -1,139 +1,190 @@
 import streamlit as st
-import sqlite3
-import csv
-import os
-import pandas as pd
-import plotly.express as px
+import dataclasses
 import datetime
-import numpy as np
-
-# Database helper functions
-def init_db():
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            done BOOLEAN NOT NULL CHECK (done IN (0, 1)),
-            priority TEXT DEFAULT 'Medium'
-        )
-    ''')
-    
-    # Migration: Add priority column if it doesn't exist
-    try:
-        c.execute('ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT "Medium"')
-    except sqlite3.OperationalError:
-        pass
+import functools
+
+from todo import (
+    ConflictError,
+    ConnectionPool,
+    TaskCache,
+    add_task,
+    archive_tasks,
+    delete_task,
+    delete_tasks,
+    edit_task,
+    export_tasks,
+    get_categories,
+    get_task_counts,
+    list_tasks_page,
+    init_db,
+    materialize_occurrences,
+    rename_category,
+    restore_tasks,
+    set_category,
+    set_pool,
+    set_priority,
+    set_recurrence,
+    start_archiver,
+    update_task_status,
+    update_tasks_status,
+)
+from todo.archive import ARCHIVE_AFTER_DAYS, AUTO_ARCHIVE
+from todo.db import DB_PATH
+from todo.export import FORMATS as EXPORT_FORMATS, MIME_TYPES as EXPORT_MIME_TYPES
+from todo.importer import import_tasks
+from todo.profiling import profile, profile_mode, span
+from todo.queries import DEADLINE_OPTIONS, PRIORITIES, TaskFilter, deadline_range
+from todo.recurrence import normalize_rule
+from todo.stats import get_burndown, get_category_stats, get_summary
+from todo.writer import get_writer
+
+
+PAGE_SIZES = [25, 50, 100, 200]
+NEW_CATEGORY = "Create New..."
+REPEAT_HELP = "daily, weekly, monthly, yearly, or a rule such as FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH. Leave empty for a one-off task."
+
+
+@st.cache_resource
+def get_connection_pool():
+    # One pool per server process, shared by every session and rerun
+    return ConnectionPool(DB_PATH)
+
+
+@st.cache_resource
+def start_background_archiver():
+    # One archiver thread per server process, on the shared pool
+    return start_archiver()
+
+
+def get_task_cache():
+    # Each session keeps its own cache of task reads across reruns
+    if 'task_cache' not in st.session_state:
+        st.session_state.task_cache = TaskCache()
+    return st.session_state.task_cache
+
+
+def get_selected_task_ids():
+    # Selection survives paging, so it lives in session state rather than
+    # only in the row checkboxes of the current page
+    if 'selected_task_ids' not in st.session_state:
+        st.session_state.selected_task_ids = set()
+    return st.session_state.selected_task_ids
+
+
+def set_selected(task_ids, selected):
+    selected_ids = get_selected_task_ids()
+    for task_id in task_ids:
+        st.session_state[f"select_{task_id}"] = selected
+        if selected:
+            selected_ids.add(task_id)
+        else:
+            selected_ids.discard(task_id)
 
-    # Migration: Add deadline column if it doesn't exist
-    try:
-        c.execute('ALTER TABLE tasks ADD COLUMN deadline TEXT')
-    except sqlite3.OperationalError:
-        pass
 
-    # Migration: Add note column if it doesn't exist
-    try:
-        c.execute('ALTER TABLE tasks ADD COLUMN note TEXT')
-    except sqlite3.OperationalError:
-        pass
+def toggle_selected(task_id):
+    if st.session_state[f"select_{task_id}"]:
+        get_selected_task_ids().add(task_id)
+    else:
+        get_selected_task_ids().discard(task_id)
+
+
+def create_task(name, priority, deadline, note, category, start_date, rule):
+    # Run on the writer thread as one operation: the task and its rule are
+    # stored together or not at all
+    task_id = add_task(name, priority, deadline, note, category, start_date)
+    if rule:
+        set_recurrence(task_id, rule)
+    return task_id
 
-    # Migration: Add category column if it doesn't exist
-    try:
-        c.execute('ALTER TABLE tasks ADD COLUMN category TEXT DEFAULT "General"')
-    except sqlite3.OperationalError:
-        pass
 
-    # Migration: Add start_date column if it doesn't exist
+def save_task(task, name, priority, deadline, note, category, start_date, rule, expected_version):
+    # Writer operation, like create_task
+    edit_task(task.id, name, priority, deadline, note, category, start_date, expected_version=expected_version)
+    # Upcoming occurrences follow a new rule or a moved date
+    if rule != task.recurrence or (rule and (deadline, start_date) != (task.deadline, task.start_date)):
+        set_recurrence(task.id, rule)
+
+
+def set_done(task_id, version):
+    # Runs only when the checkbox is clicked, so a rerun never writes back
+    # a stale widget value
+    key = f"done_{task_id}"
     try:
-        c.execute('ALTER TABLE tasks ADD COLUMN start_date TEXT')
-    except sqlite3.OperationalError:
-        pass
-        
-    conn.commit()
-    conn.close()
-
-def get_tasks():
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('SELECT id, name, done, priority, deadline, note, category, start_date FROM tasks')
-    tasks = [
-        {
-            "id": row[0], 
-            "name": row[1], 
-            "done": bool(row[2]), 
-            "priority": row[3], 
-            "deadline": row[4],
-            "note": row[5],
-            "category": row[6],
-            "start_date": row[7]
-        } 
-        for row in c.fetchall()
-    ]
-    conn.close()
-    return tasks
-
-def add_task(name, priority, deadline, note, category, start_date):
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('INSERT INTO tasks (name, done, priority, deadline, note, category, start_date) VALUES (?, ?, ?, ?, ?, ?, ?)', 
-              (name, False, priority, deadline, note, category, start_date))
-    conn.commit()
-    conn.close()
-
-def edit_task(task_id, name, priority, deadline, note, category, start_date):
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('''
-        UPDATE tasks 
-        SET name = ?, priority = ?, deadline = ?, note = ?, category = ?, start_date = ? 
-        WHERE id = ?
-    ''', (name, priority, deadline, note, category, start_date, task_id))
-    conn.commit()
-    conn.close()
-
-def update_task_status(task_id, done):
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('UPDATE tasks SET done = ? WHERE id = ?', (done, task_id))
-    conn.commit()
-    conn.close()
-
-def delete_task(task_id):
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-    conn.commit()
-    conn.close()
-
-def export_to_csv():
-    conn = sqlite3.connect('todo.db')
-    c = conn.cursor()
-    c.execute('SELECT id, name, done, priority, deadline, note, category FROM tasks')
-    rows = c.fetchall()
-    conn.close()
-
-    desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
-    file_path = os.path.join(desktop_path, "todo_export.csv")
-
-    with open(file_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(["ID", "Task Name", "Done", "Priority", "Deadline", "Note", "Category"])
-        writer.writerows(rows)
-    
-    return file_path
+        update_task_status(task_id, st.session_state[key], expected_version=version)
+    except ConflictError:
+        # Changed elsewhere since this page was read; show the current state
+        del st.session_state[key]
+        st.warning("Someone else changed this task, so it was left as it is now. Check it and try again.")
+
+
+def forget_done(task_ids):
+    # Done checkboxes are rebuilt from the tasks after a bulk change
+    for task_id in task_ids:
+        st.session_state.pop(f"done_{task_id}", None)
+
+
+def show_profile(profiler):
+    report = profiler.report()
+    with st.sidebar.expander("🐞 Profile", expanded=True):
+        p_col1, p_col2, p_col3 = st.columns(3)
+        p_col1.metric("Rerun", f"{report['ms']:.0f} ms")
+        p_col2.metric("Queries", report['statements'])
+        p_col3.metric("Rows", report['rows'])
+        st.dataframe(
+            [
+                {
+                    "Span": "\u2003" * item['depth'] + item['name'],
+                    "ms": item['ms'],
+                    "Queries": item['statements'],
+                    "Rows": item['rows'],
+                }
+                for item in report['spans']
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption("Most run statements")
+        st.code("\n".join(f"{count:>4}  {sql}" for sql, count in report['top_statements']), language=None)
+        functions = profiler.top_functions()
+        if functions:
+            st.caption("cProfile, by cumulative time")
+            st.code(functions, language=None)
+
 
 def main():
     st.set_page_config(page_title="Nomad Crab ToDo", layout="wide")
+    # Opt in with TODO_PROFILE=1 (or =cprofile). Only then may ?profile= in
+    # the URL pick the mode for a page (cprofile, or 0 for off), so visitors
+    # can't turn on profiling and its log on a shared server.
+    mode = profile_mode()
+    if mode is not None and "profile" in st.query_params:
+        mode = profile_mode(st.query_params["profile"])
+    if mode is None:
+        render()
+        return
+    with profile("rerun", cprofile=mode == "cprofile") as profiler:
+        render()
+    show_profile(profiler)
+
+
+def render():
     st.title("🦀 Nomad Crab ToDo")
 
     # Initialize database
+    set_pool(get_connection_pool())
     init_db()
+    # Upcoming occurrences of recurring tasks; a single indexed read unless
+    # the window moved on
+    materialize_occurrences()
+    if AUTO_ARCHIVE:
+        start_background_archiver()
+    cache = get_task_cache()
 
     # --- Sidebar Navigation & Filters ---
-    with st.sidebar:
+    with st.sidebar, span("sidebar"):
         st.header("Navigation")
         view_mode = st.radio("View Mode", ["List View", "Gantt Chart"])
+        page_size = st.selectbox("Tasks per page", PAGE_SIZES, index=1)
         
         st.divider()
         
@@ -143,27 +194,103 @@ def main():
         search_query = st.text_input("Search tasks", placeholder="Keyword...")
         
         # Priority Filter
-        priority_filter = st.multiselect("Priority", ["High", "Medium", "Low"], default=["High", "Medium", "Low"])
+        priority_filter = st.multiselect("Priority", PRIORITIES, default=PRIORITIES)
         
         # Category Filter (Dynamic)
-        all_tasks = get_tasks()
-        all_categories = sorted(list(set([t['category'] for t in all_tasks if t['category']])))
+        all_categories = cache.call(get_categories)
+        # Options of the add and edit forms, built once per rerun
+        category_options = [NEW_CATEGORY] + all_categories
+        category_index = {name: index for index, name in enumerate(category_options)}
         category_filter = st.multiselect("Category", all_categories, default=all_categories)
         
         # Date Filter
-        date_filter = st.selectbox("Deadline", ["All", "Today", "This Week", "Overdue"])
+        date_filter = st.selectbox("Deadline", DEADLINE_OPTIONS)
+
+        # Archived tasks are listed on their own, below the active ones
+        show_archived = st.checkbox("Include archived tasks", help="Completed tasks moved to the archive")
+
+        # --- Statistics ---
+        # Served from the trigger maintained task_stats and task_deadlines tables
+        with st.expander("📈 Statistics"):
+            today = datetime.date.today()
+            summary = cache.call(get_summary, today)
+            s_col1, s_col2 = st.columns(2)
+            s_col1.metric("Completed", f"{summary.completion:.0%}", help=f"{summary.done} of {summary.total} tasks")
+            s_col2.metric("Open", summary.total - summary.done)
+            s_col1.metric("Overdue", summary.overdue)
+            s_col2.metric("Due this week", summary.due_this_week)
+
+            st.caption("By category")
+            for group in cache.call(get_category_stats, today):
+                overdue_note = f", {group.overdue} overdue" if group.overdue else ""
+                st.progress(group.completion, text=f"{group.name or '(none)'}: {group.done}/{group.total} done{overdue_note}")
+
+            burndown_category = st.selectbox("Burndown", ["All"] + all_categories)
+            burndown = cache.call(get_burndown, None if burndown_category == "All" else burndown_category)
+            if burndown:
+                # Streamlit converts top level chart data with pandas; data
+                # given on a layer is sent as plain JSON, so the sidebar
+                # doesn't load pandas on every session's first run
+                st.vega_lite_chart(spec={
+                    "layer": [{
+                        "data": {"values": [{"Deadline": day.isoformat(), "Remaining": remaining} for day, remaining in burndown]},
+                        "mark": "line",
+                        "encoding": {
+                            "x": {"field": "Deadline", "type": "temporal"},
+                            "y": {"field": "Remaining", "type": "quantitative"},
+                        },
+                    }],
+                    "height": 160,
+                }, use_container_width=True)
+                st.caption(f"Open tasks left after each deadline, {burndown[0][0]} to {burndown[-1][0]}")
+            else:
+                st.caption("No open tasks with a deadline.")
 
         st.markdown("---")
         st.header("Actions")
-        if st.button("Export to CSV"):
+        export_format = st.selectbox("Export format", EXPORT_FORMATS, format_func=str.upper)
+        export_archive = st.checkbox("Include archive in export")
+        # The export is only generated when the button is clicked, streamed
+        # from the database in batches
+        st.download_button(
+            f"Export to {export_format.upper()}",
+            data=functools.partial(export_tasks, fmt=export_format, include_archive=export_archive),
+            file_name=f"todo_export.{export_format}",
+            mime=EXPORT_MIME_TYPES[export_format],
+        )
+
+        # Bulk import
+        uploaded_file = st.file_uploader("Import tasks", type=["csv", "jsonl"])
+        if uploaded_file is not None and st.button("Import"):
             try:
-                file_path = export_to_csv()
-                st.success(f"Tasks exported to: {file_path}")
+                report = import_tasks(uploaded_file)
             except Exception as e:
-                st.error(f"Error exporting tasks: {e}")
+                st.error(f"Error importing tasks: {e}")
+            else:
+                st.success(report.summary())
+                if report.rejected:
+                    with st.expander(f"Rejected rows ({len(report.rejected)})"):
+                        st.text("\n".join(f"line {line}: {reason}" for line, reason in report.rejected))
+
+        # Moves completed tasks out of the active table in batches
+        with st.expander("Archive completed tasks"):
+            archive_days = st.number_input("Done more than N days ago", min_value=0, value=ARCHIVE_AFTER_DAYS)
+            if st.button("Archive", use_container_width=True):
+                st.success(f"Archived {archive_tasks(archive_days)} tasks")
+
+        # Rename, or merge into an existing category: one UPDATE of its tasks
+        with st.expander("Rename category"):
+            with st.form(key='rename_category_form', clear_on_submit=True):
+                rename_from = st.selectbox("Category", all_categories)
+                rename_to = st.text_input("New name", placeholder="New or existing category")
+                rename_button = st.form_submit_button("Rename", use_container_width=True)
+            if rename_button and rename_from and rename_to.strip():
+                moved = rename_category(rename_from, rename_to.strip())
+                st.success(f"Moved {moved} tasks to {rename_to.strip()}")
+                st.rerun()
 
     # --- Add New Task ---
-    with st.expander("➕ Add New Task", expanded=False):
+    with st.expander("➕ Add New Task", expanded=False), span("add task form"):
         with st.form(key='add_task_form', clear_on_submit=True):
             col1, col2 = st.columns([2, 1])
             with col1:
@@ -180,65 +307,43 @@ def main():
                     new_deadline = st.date_input("Deadline", value=None)
                 
                 # Category Selection Logic
-                category_options = ["Create New..."] + all_categories
-                selected_category = st.selectbox("Category", category_options, index=1 if "General" in all_categories else 0)
+                selected_category = st.selectbox("Category", category_options, index=category_index.get("General", 0))
                 
-                if selected_category == "Create New...":
+                if selected_category == NEW_CATEGORY:
                     new_category = st.text_input("New Category Name", placeholder="e.g. Work, Personal")
                 else:
                     new_category = selected_category
+
+                new_repeat = st.text_input("Repeat", placeholder="e.g. weekly", help=REPEAT_HELP)
             
             submit_button = st.form_submit_button(label='Add Task', use_container_width=True)
 
         if submit_button:
-            if new_task:
-                add_task(new_task, new_priority, new_deadline, new_note, new_category, new_start_date)
-                st.success(f"Added task: {new_task}")
-                st.rerun()
-            else:
+            if not new_task:
                 st.warning("Please enter a task name.")
+            else:
+                try:
+                    get_writer().call(create_task, new_task, new_priority, new_deadline, new_note, new_category,
+                                      new_start_date, normalize_rule(new_repeat))
+                except ValueError as e:
+                    st.error(f"Invalid repeat rule: {e}")
+                else:
+                    st.success(f"Added task: {new_task}")
+                    st.rerun()
 
     # --- Logic: Filter & Sort ---
-    # import datetime # Already imported at top
-    
-    filtered_tasks = all_tasks
-
-    # 1. Search
-    if search_query:
-        filtered_tasks = [t for t in filtered_tasks if search_query.lower() in t['name'].lower() or (t['note'] and search_query.lower() in t['note'].lower())]
-
-    # 2. Priority
-    if priority_filter:
-        filtered_tasks = [t for t in filtered_tasks if t['priority'] in priority_filter]
-
-    # 3. Category
-    if category_filter:
-        filtered_tasks = [t for t in filtered_tasks if t['category'] in category_filter]
-
-    # 4. Date
+    # Filtering and ordering (open first, High priority first, earliest
+    # deadline first) run in SQLite against the task indexes.
     today = datetime.date.today()
-    if date_filter == "Today":
-        filtered_tasks = [t for t in filtered_tasks if t['deadline'] == str(today)]
-    elif date_filter == "This Week":
-        start_of_week = today - datetime.timedelta(days=today.weekday())
-        end_of_week = start_of_week + datetime.timedelta(days=6)
-        filtered_tasks = [t for t in filtered_tasks if t['deadline'] and start_of_week <= datetime.datetime.strptime(t['deadline'], '%Y-%m-%d').date() <= end_of_week]
-    elif date_filter == "Overdue":
-        filtered_tasks = [t for t in filtered_tasks if t['deadline'] and datetime.datetime.strptime(t['deadline'], '%Y-%m-%d').date() < today and not t['done']]
-
-    # Sorting
-    # Priority Order: High=3, Medium=2, Low=1
-    priority_map = {"High": 3, "Medium": 2, "Low": 1}
-    
-    filtered_tasks.sort(key=lambda x: (
-        x['done'], # Completed last
-        -priority_map.get(x['priority'], 0), # High priority first
-        x['deadline'] if x['deadline'] else "9999-99-99" # Earliest deadline first
-    ))
+    task_filter = TaskFilter(
+        search=search_query,
+        priorities=tuple(priority_filter),
+        categories=tuple(category_filter),
+        **deadline_range(date_filter, today),
+    )
 
     # --- Progress Bar ---
-    total_tasks_count = len(filtered_tasks)
-    completed_tasks_count = len([t for t in filtered_tasks if t['done']])
+    total_tasks_count, completed_tasks_count = cache.call(get_task_counts, task_filter)
     if total_tasks_count > 0:
         progress = completed_tasks_count / total_tasks_count
         st.progress(progress, text=f"Progress: {int(progress * 100)}%")
@@ -247,179 +352,257 @@ def main():
 
     if view_mode == "List View":
         # --- Task List Rendering ---
-        st.subheader(f"Your Tasks ({len(filtered_tasks)})")
+        st.subheader(f"Your Tasks ({total_tasks_count})")
         
-        if not filtered_tasks:
+        if total_tasks_count == 0:
             st.info("No tasks match your filters.")
         else:
-            for task in filtered_tasks:
-                # Row Styling
-                priority_color = {
-                    "High": "rgba(255, 0, 0, 0.1)",
-                    "Medium": "rgba(255, 165, 0, 0.1)",
-                    "Low": "rgba(0, 128, 0, 0.1)"
-                }
-                bg_color = priority_color.get(task['priority'], "transparent")
-                if task['done']:
-                    bg_color = "rgba(200, 200, 200, 0.1)" # Grey out completed
-
-                # Check overdue
-                is_overdue = False
-                if task['deadline'] and not task['done']:
-                    deadline_date = datetime.datetime.strptime(task['deadline'], '%Y-%m-%d').date()
-                    if deadline_date < today:
-                        is_overdue = True
-
-                with st.container():
-                    # Custom CSS for row background is hard in pure Streamlit without unsafe_allow_html
-                    # We'll use columns and standard widgets, but add visual cues.
+            # Pages are fetched by cursor (the sort key of the previous page's
+            # last row); keep the cursor of every page visited for "Previous".
+            if st.session_state.get('page_key') != (task_filter, page_size):
+                st.session_state.page_key = (task_filter, page_size)
+                st.session_state.page_cursors = [None]
+            page_cursors = st.session_state.page_cursors
+            page_tasks, next_cursor = cache.call(list_tasks_page, task_filter, page_cursors[-1], page_size)
+            if not page_tasks and len(page_cursors) > 1:
+                # The last page emptied out (e.g. its tasks were deleted)
+                page_cursors.pop()
+                st.rerun()
+
+            # --- Bulk Actions ---
+            # Applied to all selected tasks in one transaction and one rerun
+            selected_ids = get_selected_task_ids()
+            with st.container(border=True), span("bulk actions"):
+                b_col1, b_col2, b_col3, b_col4, b_col5, b_col6 = st.columns([0.16, 0.14, 0.14, 0.14, 0.21, 0.21])
+                b_col1.markdown(f"**{len(selected_ids)} selected**")
+                if b_col1.button("Select page", key="select_page"):
+                    set_selected([task.id for task in page_tasks], True)
+                    st.rerun()
+                if b_col1.button("Clear", key="clear_selection", disabled=not selected_ids):
+                    set_selected(list(selected_ids), False)
+                    st.rerun()
+                if b_col2.button("✅ Complete", key="bulk_complete", disabled=not selected_ids):
+                    update_tasks_status(selected_ids, True)
+                    forget_done(selected_ids)
+                    set_selected(list(selected_ids), False)
+                    st.rerun()
+                if b_col3.button("↩️ Reopen", key="bulk_reopen", disabled=not selected_ids):
+                    update_tasks_status(selected_ids, False)
+                    forget_done(selected_ids)
+                    set_selected(list(selected_ids), False)
+                    st.rerun()
+                if b_col4.button("🗑️ Delete", key="bulk_delete", disabled=not selected_ids):
+                    delete_tasks(selected_ids)
+                    forget_done(selected_ids)
+                    set_selected(list(selected_ids), False)
+                    st.rerun()
+                bulk_priority = b_col5.selectbox("Priority", PRIORITIES, key="bulk_priority", label_visibility="collapsed")
+                if b_col5.button("Set priority", key="bulk_set_priority", disabled=not selected_ids):
+                    set_priority(selected_ids, bulk_priority)
+                    set_selected(list(selected_ids), False)
+                    st.rerun()
+                bulk_category = b_col6.selectbox("Category", all_categories, key="bulk_category", label_visibility="collapsed")
+                if b_col6.button("Set category", key="bulk_set_category", disabled=not (selected_ids and bulk_category)):
+                    set_category(selected_ids, bulk_category)
+                    set_selected(list(selected_ids), False)
+                    st.rerun()
+
+            # One set of widgets per row, usually the bulk of a rerun
+            with span("task rows"):
+                for task in page_tasks:
+                    # Overdue is worked out by the query
+                    is_overdue = task.overdue
+
+                    with st.container():
+                        # Custom CSS for row background is hard in pure Streamlit without unsafe_allow_html
+                        # We'll use columns and standard widgets, but add visual cues.
                     
-                    col1, col2, col3, col4, col5, col6 = st.columns([0.05, 0.4, 0.15, 0.15, 0.15, 0.1])
+                        col0, col1, col2, col3, col4, col5, col6 = st.columns([0.04, 0.04, 0.37, 0.15, 0.15, 0.15, 0.1])
+
+                        # Selection for bulk actions
+                        select_key = f"select_{task.id}"
+                        if select_key not in st.session_state:
+                            st.session_state[select_key] = task.id in selected_ids
+                        col0.checkbox("Select", key=select_key, label_visibility="collapsed",
+                                      help="Select for bulk actions", on_change=toggle_selected, args=(task.id,))
                     
-                    # Checkbox
-                    done = col1.checkbox("", value=task["done"], key=f"done_{task['id']}")
-                    if done != task["done"]:
-                        update_task_status(task["id"], done)
-                        st.rerun()
-
-                    # Task Name & Note
-                    with col2:
-                        name_html = f"**{task['name']}**"
-                        if task['done']:
-                            name_html = f"~~{task['name']}~~"
+                        # Checkbox
+                        col1.checkbox("", value=task.done, key=f"done_{task.id}", on_change=set_done, args=(task.id, task.version))
+
+                        # Task Name & Note
+                        with col2:
+                            name_html = f"**{task.name}**"
+                            if task.done:
+                                name_html = f"~~{task.name}~~"
                         
-                        if is_overdue:
-                            name_html = f"<span style='color:red'>⚠️ {name_html}</span>"
+                            if task.recurrence or task.series_id:
+                                name_html = f"🔁 {name_html}"
+                            if is_overdue:
+                                name_html = f"<span style='color:red'>⚠️ {name_html}</span>"
                         
-                        st.markdown(name_html, unsafe_allow_html=True)
-                        if task['note']:
-                            st.caption(task['note'])
-
-                    # Priority
-                    priority_emoji = {"High": "🔴", "Medium": "🟠", "Low": "🟢"}
-                    col3.text(f"{priority_emoji.get(task['priority'], '')} {task['priority']}")
-
-                    # Deadline
-                    deadline_str = task['deadline'] if task['deadline'] else "-"
-                    if is_overdue:
-                        col4.markdown(f":red[{deadline_str}]")
-                    else:
-                        col4.text(deadline_str)
-
-                    # Category
-                    col5.markdown(f"`{task['category']}`")
-
-                    # Actions (Edit/Delete)
-                    with col6:
-                        # Delete
-                        if st.button("🗑️", key=f"delete_{task['id']}", help="Delete Task"):
-                            delete_task(task["id"])
-                            st.rerun()
-
-                    # Edit Expander (Full width below the row)
-                    with st.expander("Edit Details"):
-                        with st.form(key=f"edit_form_{task['id']}"):
-                            e_name = st.text_input("Task Name", value=task['name'])
-                            e_col1, e_col2 = st.columns(2)
-                            with e_col1:
-                                e_priority = st.selectbox("Priority", ["High", "Medium", "Low"], index=["High", "Medium", "Low"].index(task['priority']))
-                                
-                                # Edit Category Logic
-                                e_cat_options = ["Create New..."] + all_categories
-                                # Ensure current category is in options, if not (shouldn't happen normally but for safety), add it
-                                if task['category'] not in e_cat_options:
-                                    e_cat_options.append(task['category'])
-                                    
-                                e_cat_index = e_cat_options.index(task['category'])
-                                e_selected_cat = st.selectbox("Category", e_cat_options, index=e_cat_index, key=f"cat_select_{task['id']}")
-                                
-                                if e_selected_cat == "Create New...":
-                                    e_category = st.text_input("New Category Name", key=f"new_cat_{task['id']}")
-                                else:
-                                    e_category = e_selected_cat
-                            with e_col2:
-                                e_start_val = datetime.datetime.strptime(task['start_date'], '%Y-%m-%d').date() if task.get('start_date') else None
-                                e_start_date = st.date_input("Start Date", value=e_start_val)
-                                
-                                e_deadline_val = datetime.datetime.strptime(task['deadline'], '%Y-%m-%d').date() if task['deadline'] else None
-                                e_deadline = st.date_input("Deadline", value=e_deadline_val)
+                            st.markdown(name_html, unsafe_allow_html=True)
+                            if task.note:
+                                st.caption(task.note)
+
+                        # Priority
+                        priority_emoji = {"High": "🔴", "Medium": "🟠", "Low": "🟢"}
+                        col3.text(f"{priority_emoji.get(task.priority, '')} {task.priority}")
+
+                        # Deadline
+                        deadline_str = task.deadline.isoformat() if task.deadline else "-"
+                        if is_overdue:
+                            col4.markdown(f":red[{deadline_str}]")
+                        else:
+                            col4.text(deadline_str)
+
+                        # Category
+                        col5.markdown(f"`{task.category}`")
+
+                        # Actions (Edit/Delete)
+                        with col6:
+                            a_col1, a_col2 = st.columns(2)
+                            # Edit
+                            if a_col1.button("✏️", key=f"edit_{task.id}", help="Edit Task"):
+                                st.session_state.editing_task_id = task.id
+                                # Saving only succeeds if nobody changed the
+                                # task since the form was opened
+                                st.session_state.editing_version = task.version
+                            # Delete
+                            if a_col2.button("🗑️", key=f"delete_{task.id}", help="Delete Task"):
+                                delete_task(task.id)
+                                st.rerun()
+
+                        # Edit form (full width below the row), only built for the
+                        # row being edited
+                        if st.session_state.get('editing_task_id') == task.id:
+                            with st.form(key=f"edit_form_{task.id}"):
+                                e_name = st.text_input("Task Name", value=task.name)
+                                e_col1, e_col2 = st.columns(2)
+                                with e_col1:
+                                    e_priority = st.selectbox("Priority", ["High", "Medium", "Low"], index=["High", "Medium", "Low"].index(task.priority))
                             
-                            e_note = st.text_area("Note", value=task['note'])
+                                    # Edit Category Logic. A task without a category
+                                    # starts on "Create New..."
+                                    e_selected_cat = st.selectbox("Category", category_options, index=category_index.get(task.category, 0), key=f"cat_select_{task.id}")
                             
-                            if st.form_submit_button("Save Changes"):
-                                edit_task(task['id'], e_name, e_priority, e_deadline, e_note, e_category, e_start_date)
-                                st.success("Updated!")
-                                st.rerun()
-                    
-                    st.divider()
+                                    if e_selected_cat == NEW_CATEGORY:
+                                        e_category = st.text_input("New Category Name", key=f"new_cat_{task.id}")
+                                    else:
+                                        e_category = e_selected_cat
+                                with e_col2:
+                                    e_start_date = st.date_input("Start Date", value=task.start_date)
+                            
+                                    e_deadline = st.date_input("Deadline", value=task.deadline)
+                        
+                                e_note = st.text_area("Note", value=task.note)
+                                e_repeat = st.text_input("Repeat", value=task.recurrence or "", help=REPEAT_HELP, key=f"repeat_{task.id}")
+                        
+                                s_col1, s_col2 = st.columns(2)
+                                if s_col1.form_submit_button("Save Changes"):
+                                    try:
+                                        get_writer().call(save_task, task, e_name, e_priority, e_deadline, e_note, e_category,
+                                                          e_start_date, normalize_rule(e_repeat),
+                                                          st.session_state.get('editing_version'))
+                                    except ValueError as e:
+                                        st.error(f"Invalid repeat rule: {e}")
+                                    except ConflictError as e:
+                                        # Saving again overwrites the other change
+                                        st.session_state.editing_version = e.task.version
+                                        st.error("Someone else changed this task while you were editing it. "
+                                                 "Check the current values above and save again to overwrite them.")
+                                    else:
+                                        st.session_state.editing_task_id = None
+                                        st.success("Updated!")
+                                        st.rerun()
+                                if s_col2.form_submit_button("Cancel"):
+                                    st.session_state.editing_task_id = None
+                                    st.rerun()
+
+                        st.divider()
+
+            # --- Pagination ---
+            page_count = -(-total_tasks_count // page_size)
+            p_col1, p_col2, p_col3 = st.columns([1, 2, 1])
+            if p_col1.button("◀ Previous", disabled=len(page_cursors) == 1):
+                page_cursors.pop()
+                st.rerun()
+            p_col2.caption(f"Page {len(page_cursors)} of {page_count}")
+            if p_col3.button("Next ▶", disabled=next_cursor is None):
+                page_cursors.append(next_cursor)
+                st.rerun()
+
+        if show_archived:
+            # --- Archived Tasks ---
+            # Read only, with the same filters and its own page cursors
+            archive_filter = dataclasses.replace(task_filter, archived=True)
+            archived_count, _ = cache.call(get_task_counts, archive_filter)
+            st.subheader(f"🗄️ Archived Tasks ({archived_count})")
+            if archived_count == 0:
+                st.info("No archived tasks match your filters.")
+            else:
+                if st.session_state.get('archive_page_key') != (archive_filter, page_size):
+                    st.session_state.archive_page_key = (archive_filter, page_size)
+                    st.session_state.archive_cursors = [None]
+                archive_cursors = st.session_state.archive_cursors
+                archived_tasks, next_archived = cache.call(list_tasks_page, archive_filter, archive_cursors[-1], page_size)
+                if not archived_tasks and len(archive_cursors) > 1:
+                    archive_cursors.pop()
+                    st.rerun()
+                for task in archived_tasks:
+                    a_col1, a_col2, a_col3 = st.columns([0.7, 0.18, 0.12])
+                    a_col1.markdown(f"~~{task.name}~~")
+                    a_col2.caption(f"{task.priority} · {task.category} · {task.deadline or 'no deadline'}")
+                    if a_col3.button("Restore", key=f"restore_{task.id}"):
+                        restore_tasks([task.id])
+                        st.rerun()
+                a_col1, a_col2, a_col3 = st.columns([1, 2, 1])
+                if a_col1.button("◀ Previous", key="archive_previous", disabled=len(archive_cursors) == 1):
+                    archive_cursors.pop()
+                    st.rerun()
+                a_col2.caption(f"Page {len(archive_cursors)} of {-(-archived_count // page_size)}")
+                if a_col3.button("Next ▶", key="archive_next", disabled=next_archived is None):
+                    archive_cursors.append(next_archived)
+                    st.rerun()
 
     elif view_mode == "Gantt Chart":
+        # pandas, NumPy and Plotly are only needed here, so they are loaded
+        # the first time a session opens the chart, not at startup
+        import gantt
+
         st.subheader("📊 Gantt Chart")
-        
-        # Prepare data for Gantt
-        gantt_data = []
-        for task in filtered_tasks:
-            if task['start_date'] and task['deadline']:
-                gantt_data.append({
-                    "Task": task['name'],
-                    "Start": task['start_date'],
-                    "Finish": task['deadline'],
-                    "Priority": task['priority'],
-                    "Category": task['category'],
-                    "Done": "Done" if task['done'] else "Pending"
-                })
-        
-        if gantt_data:
-            df = pd.DataFrame(gantt_data)
-            
-            # Convert to datetime to avoid serialization issues
-            df["Start"] = pd.to_datetime(df["Start"])
-            df["Finish"] = pd.to_datetime(df["Finish"])
-            
-            # Sort by Start date
-            df = df.sort_values(by="Start")
-            
-            fig = px.timeline(
-                df, 
-                x_start="Start", 
-                x_end="Finish", 
-                y="Task", 
-                color="Priority",
-                hover_data=["Category", "Done"],
-                color_discrete_map={"High": "red", "Medium": "orange", "Low": "green"}
-            )
+        df = cache.call(gantt.load_gantt_frame, task_filter)
 
-            # Workaround for Streamlit/Plotly serialization issue with timedelta
-            for trace in fig.data:
-                if trace.x is not None and len(trace.x) > 0:
-                    # Find the first non-null value to check type
-                    first_valid = next((v for v in trace.x if v is not None and not pd.isnull(v)), None)
-                    
-                    if first_valid and isinstance(first_valid, (pd.Timedelta, datetime.timedelta, np.timedelta64)):
-                        new_x = []
-                        for v in trace.x:
-                            if v is None or pd.isnull(v):
-                                new_x.append(None)
-                            elif hasattr(v, 'total_seconds'):
-                                new_x.append(v.total_seconds() * 1000)
-                            elif isinstance(v, np.timedelta64):
-                                # Convert numpy timedelta64 to milliseconds
-                                new_x.append(v.astype('timedelta64[ms]').astype(float))
-                            else:
-                                new_x.append(v)
-                        trace.x = new_x
-            
-            # Update layout for better visibility
-            fig.update_yaxes(autorange="reversed") # Tasks from top to bottom
-            fig.update_layout(xaxis_title="Date", yaxis_title="Task")
-            
-            st.plotly_chart(fig, use_container_width=True)
-        else:
+        if df.empty:
             st.info("No tasks with both Start Date and Deadline found to display in Gantt Chart.")
             st.markdown("""
                 **Tip:** To see tasks here, make sure they have both a **Start Date** and a **Deadline**.
                 You can edit existing tasks to add these dates.
             """)
+        elif len(df) <= gantt.DETAIL_LIMIT:
+            fig = gantt.build_gantt_figure(df)
+            with span("plotly_chart"):
+                st.plotly_chart(fig, use_container_width=True)
+        else:
+            # Too many bars for the browser: show task density per
+            # category/priority lane, with drill-down into a single lane
+            lanes = gantt.lane_summary(df)
+            st.caption(f"{len(df)} tasks in {len(lanes)} lanes. Showing tasks scheduled per week; pick a lane to see its tasks.")
+            lane = st.selectbox(
+                "Drill down",
+                ["Overview"] + list(lanes.index),
+                format_func=lambda name: name if name == "Overview" else f"{name} ({lanes.at[name, 'Tasks']} tasks)",
+            )
+            if lane == "Overview":
+                fig = gantt.build_density_figure(df)
+            else:
+                fig = gantt.build_detail_figure(df[gantt.lane_labels(df) == lane])
+            with span("plotly_chart"):
+                st.plotly_chart(fig, use_container_width=True)
+
+    # --- Cache statistics ---
+    stats = cache.stats()
+    st.sidebar.caption(f"Task cache: {stats['hits']} hits, {stats['misses']} misses, {stats['invalidations']} invalidations")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,83 @@
+"""Seeded synthetic task databases for benchmarks.
+
+    python benchmarks/generate.py 100000 bench.db [--seed 0]
+"""
+import argparse
+import datetime
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from todo import ConnectionPool, init_db, set_pool, transaction
+from todo.tasks import INSERT_TASK_SQL
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+WORDS = (
+    "review", "write", "call", "plan", "fix", "update", "prepare", "send", "check", "book",
+    "report", "invoice", "meeting", "draft", "release", "budget", "slides", "ticket", "order", "backup",
+)
+CATEGORIES = ("General", "Work", "Home", "Errands", "Health", "Finance", "Study", "Travel", "Garden", "Car")
+PRIORITIES = ("High", "Medium", "Low")
+# Fixed dates keep the data identical between runs; relative to today they
+# make a mix of overdue, current and future tasks
+FIRST_DAY = datetime.date(2024, 1, 1)
+DAYS = 730
+
+
+def generate_rows(count, seed=0):
+    """Yield INSERT_TASK_SQL parameter tuples, the same ones for a given seed."""
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}"
+        note = " ".join(rng.choices(WORDS, k=rng.randint(3, 12))) if rng.random() < 0.4 else None
+        start = deadline = None
+        if rng.random() < 0.7:
+            start_day = FIRST_DAY + datetime.timedelta(days=rng.randrange(DAYS))
+            deadline = (start_day + datetime.timedelta(days=rng.randint(0, 30))).isoformat()
+            if rng.random() < 0.8:
+                start = start_day.isoformat()
+        yield (
+            name,
+            rng.random() < 0.35,
+            rng.choice(PRIORITIES),
+            deadline,
+            note,
+            rng.choice(CATEGORIES),
+            start,
+        )
+
+
+def create_database(path, count, seed=0, batch_size=10000):
+    """Create ``path`` holding ``count`` generated tasks and point the pool at it."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    set_pool(ConnectionPool(path))
+    init_db()
+    rows = generate_rows(count, seed)
+    with transaction() as conn:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            conn.executemany(INSERT_TASK_SQL, batch)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('count', help=f"number of tasks or one of {', '.join(SIZES)}")
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    count = SIZES.get(args.count.lower()) or int(args.count)
+    create_database(args.path, count, args.seed)
+    print(f"Wrote {count} tasks to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Cold import time of the backend and the UI, from python -X importtime.
+
+    python benchmarks/import_time.py [--repeat 5] [--json]
+
+Each module is imported in a fresh interpreter. Reported are the median
+total import time, the slowest top level imports, and which of the heavy
+optional packages got loaded along the way.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each consumer imports at startup: scripts and the CLI only need the
+# backend; the UI adds Streamlit; gantt is what the Gantt view loads on demand
+TARGETS = ('todo', 'todo.cli', 'streamlit', 'app', 'gantt')
+HEAVY = ('pandas', 'numpy', 'plotly.graph_objects', 'pyarrow', 'streamlit')
+
+PROBE = "import json, sys; import {module}; print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+
+
+def parse_importtime(stderr, module):
+    """Import time of ``module`` from -X importtime output, in us.
+
+    Returns (total, [(cumulative, package)] of the imports it triggered
+    directly). Interpreter startup imports are left out.
+    """
+    total = 0
+    children = []
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, package = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level and come
+        # before the package that triggered them
+        depth = (len(package) - len(package.lstrip()) - 1) // 2
+        name = package.strip()
+        if depth == 1:
+            pending.append((int(cumulative), name))
+        elif depth == 0:
+            if name == module or module.startswith(name + '.'):
+                total += int(cumulative)
+                children += pending
+            pending = []
+    return total, children
+
+
+def measure(module):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module, heavy=HEAVY)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total, children = parse_importtime(result.stderr, module)
+    return total, children, json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=list(TARGETS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help="slowest top level imports to list")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        runs = sorted(measure(module) for _ in range(args.repeat))
+        totals = [total for total, _, _ in runs]
+        _, imports, heavy = runs[len(runs) // 2]
+        results.append({
+            'module': module,
+            'median_ms': round(statistics.median(totals) / 1000, 1),
+            'min_ms': round(min(totals) / 1000, 1),
+            'slowest': [(package, round(cumulative / 1000, 1)) for cumulative, package in sorted(imports, reverse=True)[:args.top]],
+            'loaded': heavy,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['module']:<10} {result['median_ms']:8.1f} ms  (min {result['min_ms']:.1f})"
+              f"  loads: {', '.join(result['loaded']) or '-'}")
+        for package, ms in result['slowest']:
+            print(f"    {ms:8.1f} ms  {package}")
+
+
+if __name__ == '__main__':
+    main()
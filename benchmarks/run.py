@@ -0,0 +1,229 @@
+"""Time the todo backend and the Streamlit render path, results as JSON.
+
+    python benchmarks/run.py --size 1k --size 100k --output results.json
+    python benchmarks/run.py --size 1k --compare results.json
+
+Databases are generated once per size and seed into --data-dir and reused.
+With --compare, cases whose median got slower than --threshold times the
+earlier result are listed and the exit status is 1.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from generate import SIZES, create_database
+from todo import (
+    ConnectionPool,
+    TaskFilter,
+    deadline_range,
+    export_tasks,
+    get_task_counts,
+    get_tasks,
+    list_tasks,
+    list_tasks_page,
+    set_pool,
+)
+from todo.migrations import SCHEMA_VERSION
+
+# Runs main() headless with AppTest in a child process, so the app reads the
+# benchmark database through TODO_DB like it would in production.
+APP_TEST_SCRIPT = '''
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app_path, view, repeat = sys.argv[1], sys.argv[2], int(sys.argv[3])
+times = []
+for _ in range(repeat):
+    at = AppTest.from_file(app_path, default_timeout=600)
+    started = time.perf_counter()
+    at.run()
+    if view != "List View":
+        at.sidebar.radio[0].set_value(view)
+        started = time.perf_counter()
+        at.run()
+    times.append(time.perf_counter() - started)
+    if at.exception:
+        raise SystemExit(at.exception[0].message)
+print(json.dumps(times))
+'''
+
+
+def backend_cases():
+    cases = {
+        'get_tasks': get_tasks,
+        'list_tasks': lambda: list_tasks(TaskFilter()),
+        'list_tasks_filtered': lambda: list_tasks(
+            TaskFilter(priorities=('High',), categories=('Work', 'Home'), done=False)),
+        'list_tasks_overdue': lambda: list_tasks(TaskFilter(**deadline_range("Overdue"))),
+        'list_tasks_page': lambda: list_tasks_page(TaskFilter(), None, 50),
+        'search_page': lambda: list_tasks_page(TaskFilter(search="report"), None, 50),
+        'task_counts': lambda: get_task_counts(TaskFilter(priorities=('High', 'Medium'))),
+        'task_counts_search': lambda: get_task_counts(TaskFilter(search="report")),
+        'export_csv': lambda: export_tasks(io.BytesIO(), 'csv'),
+        'export_jsonl': lambda: export_tasks(io.BytesIO(), 'jsonl'),
+    }
+    try:
+        import gantt
+    except ImportError:
+        return cases
+
+    def gantt_prep():
+        df = gantt.load_gantt_frame(TaskFilter())
+        if len(df) <= gantt.DETAIL_LIMIT:
+            return gantt.build_gantt_figure(df)
+        return gantt.build_density_figure(df)
+
+    cases['gantt_frame'] = lambda: gantt.load_gantt_frame(TaskFilter())
+    cases['gantt_prep'] = gantt_prep
+    return cases
+
+
+def time_call(func, repeat):
+    # One untimed call first so every timed run sees a warm page cache
+    func()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def time_app(path, view, repeat):
+    env = dict(os.environ, TODO_DB=path)
+    result = subprocess.run(
+        [sys.executable, '-c', APP_TEST_SCRIPT, os.path.join(ROOT, 'app.py'), view, str(repeat)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "AppTest failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(size, case, times):
+    return {
+        'size': size,
+        'case': case,
+        'runs': len(times),
+        'min_ms': round(min(times) * 1000, 3),
+        'median_ms': round(statistics.median(times) * 1000, 3),
+        'mean_ms': round(statistics.fmean(times) * 1000, 3),
+    }
+
+
+def database_for(data_dir, count, seed):
+    """Path of a generated database, creating it only when missing or outdated."""
+    path = os.path.join(data_dir, f'tasks-{count}-seed{seed}.db')
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            current = conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        finally:
+            conn.close()
+        if current:
+            set_pool(ConnectionPool(path))
+            return path
+    os.makedirs(data_dir, exist_ok=True)
+    started = time.perf_counter()
+    create_database(path, count, seed)
+    print(f"generated {count} tasks in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['size'], r['case']): r for r in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get((result['size'], result['case']))
+        if not before or not before['median_ms']:
+            continue
+        ratio = result['median_ms'] / before['median_ms']
+        marker = '  SLOWER' if ratio > threshold else ''
+        print(f"{result['size']:>8} {result['case']:<22} {before['median_ms']:10.2f} -> {result['median_ms']:10.2f} ms"
+              f"  x{ratio:.2f}{marker}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', action='append', help=f"tasks per database, a number or one of {', '.join(SIZES)}"
+                        " (repeatable, default 1k)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--case', action='append', help="only run these cases (repeatable)")
+    parser.add_argument('--no-app', action='store_true', help="skip the headless Streamlit runs")
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'))
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    parser.add_argument('--compare', metavar='JSON', help="earlier results to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.size or ['1k']:
+        count = SIZES.get(size.lower()) or int(size)
+        path = database_for(args.data_dir, count, args.seed)
+        cases = backend_cases()
+        for name, func in cases.items():
+            if args.case and name not in args.case:
+                continue
+            results.append(summarize(count, name, time_call(func, args.repeat)))
+            print(f"{count:>8} {name:<22} {results[-1]['median_ms']:10.2f} ms", file=sys.stderr)
+        if args.no_app:
+            continue
+        for name, view in (('app_list_view', "List View"), ('app_gantt_view', "Gantt Chart")):
+            if args.case and name not in args.case:
+                continue
+            try:
+                times = time_app(path, view, args.repeat)
+            except (RuntimeError, ValueError) as e:
+                print(f"{count:>8} {name:<22} skipped: {e}", file=sys.stderr)
+                continue
+            results.append(summarize(count, name, times))
+            print(f"{count:>8} {name:<22} {results[-1]['median_ms']:10.2f} ms", file=sys.stderr)
+
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Memory used by 100k tasks read as dicts, as Task records and as a DataFrame.
+
+    python benchmarks/task_memory.py [--tasks 100000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from generate import create_database
+from todo import TaskFilter, connection, list_tasks, load_task_frame
+from todo.queries import select_tasks
+
+
+def load_dicts():
+    # The per-row dicts get_tasks() used to build
+    sql, params = select_tasks(TaskFilter())
+    with connection() as conn:
+        return [
+            {
+                "id": row[0], "name": row[1], "done": bool(row[2]), "priority": row[3],
+                "deadline": row[4], "note": row[5], "category": row[6], "start_date": row[7],
+            }
+            for row in conn.execute(sql, params)
+        ]
+
+
+def measure(label, load):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {current / 2**20:8.1f} MiB held {peak / 2**20:8.1f} MiB peak {seconds:7.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        create_database(os.path.join(directory, 'bench.db'), args.tasks)
+        print(f"{args.tasks} tasks")
+        measure("dict rows", load_dicts)
+        measure("Task records", list_tasks)
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            print("DataFrame      skipped, pandas is not installed")
+        else:
+            df = measure("DataFrame", load_task_frame)
+            # Arrow-backed string columns are allocated outside tracemalloc's view
+            print(f"{'':<14} {df.memory_usage(deep=True).sum() / 2**20:8.1f} MiB by DataFrame.memory_usage(deep=True)")
+
+
+if __name__ == '__main__':
+    main()
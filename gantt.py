@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from todo import connection
+from todo.profiling import traced
+from todo.queries import PRIORITIES, select_gantt
+
+PRIORITY_COLORS = {"High": "red", "Medium": "orange", "Low": "green"}
+
+# Above this many tasks one bar per task gets too heavy for the browser, so
+# the chart switches to density bands per category/priority lane
+DETAIL_LIMIT = 2000
+
+HOVER_TEMPLATE = (
+    "<b>%{y}</b><br>"
+    "Start: %{base|%Y-%m-%d}<br>"
+    "Finish: %{customdata[0]}<br>"
+    "Category: %{customdata[1]}<br>"
+    "%{customdata[2]}"
+    "<extra>%{fullData.name}</extra>"
+)
+
+
+@traced
+def load_gantt_frame(task_filter):
+    """Tasks with a start date and deadline, read straight into a DataFrame."""
+    sql, params = select_gantt(task_filter)
+    with connection() as conn:
+        return pd.read_sql(sql, conn, params=params, parse_dates={"Start": "%Y-%m-%d", "Finish": "%Y-%m-%d"})
+
+
+def _ordered_priorities(priorities):
+    return list(PRIORITIES) + sorted(set(priorities) - set(PRIORITIES), key=str)
+
+
+@traced
+def build_gantt_figure(df):
+    """Horizontal bars from Start to Finish, one trace per priority.
+
+    Bars are drawn with base=start and x=duration in milliseconds, computed
+    for the whole column at once, which is what px.timeline produces but
+    without timedelta values that need fixing up element by element.
+    """
+    durations = (df["Finish"] - df["Start"]).to_numpy().astype("timedelta64[ms]").astype(np.float64)
+    customdata = np.column_stack([
+        df["Finish"].dt.strftime("%Y-%m-%d").to_numpy(),
+        df["Category"].fillna("").to_numpy(),
+        df["Done"].to_numpy(),
+    ])
+
+    fig = go.Figure()
+    priorities = df["Priority"].to_numpy()
+    for priority in _ordered_priorities(priorities):
+        mask = priorities == priority
+        if not mask.any():
+            continue
+        fig.add_trace(go.Bar(
+            name=str(priority),
+            orientation="h",
+            y=df["Task"].to_numpy()[mask],
+            base=df["Start"].to_numpy()[mask],
+            x=durations[mask],
+            marker_color=PRIORITY_COLORS.get(priority),
+            customdata=customdata[mask],
+            hovertemplate=HOVER_TEMPLATE,
+        ))
+
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(autorange="reversed") # Tasks from top to bottom
+    fig.update_layout(barmode="overlay", xaxis_title="Date", yaxis_title="Task", legend_title_text="Priority")
+    return fig
+
+
+def lane_labels(df):
+    """Swimlane of every row: "<category> · <priority>"."""
+    return df["Category"].fillna("(none)").astype(str) + " · " + df["Priority"].fillna("").astype(str)
+
+
+def lane_summary(df):
+    """Task count and overall span of each lane, ordered by category then priority."""
+    lanes = df.assign(Lane=lane_labels(df)).groupby("Lane").agg(
+        Category=("Category", "first"),
+        Priority=("Priority", "first"),
+        Tasks=("Task", "size"),
+        Start=("Start", "min"),
+        Finish=("Finish", "max"),
+    )
+    rank = {priority: i for i, priority in enumerate(PRIORITIES)}
+    lanes["Rank"] = lanes["Priority"].map(rank).fillna(len(rank))
+    return lanes.sort_values(["Category", "Rank"]).drop(columns="Rank")
+
+
+@traced
+def build_density_figure(df, freq="W-SUN"):
+    """Heatmap of how many tasks are scheduled in each lane per period.
+
+    Periods are named by their end, so the default "W-SUN" is weeks from
+    Monday to Sunday, as in the deadline filter and the burndown.
+
+    Counting uses a difference array: +1 at each task's first period, -1 after
+    its last, then a cumulative sum along time, so the cost is linear in the
+    number of tasks and the figure size only depends on lanes x periods.
+    """
+    lanes = lane_summary(df)
+    lane_index = pd.Index(lanes.index)
+    periods = pd.period_range(df["Start"].min(), df["Finish"].max(), freq=freq)
+    first = periods[0].ordinal
+
+    rows = lane_index.get_indexer(lane_labels(df))
+    starts = df["Start"].dt.to_period(freq).array.asi8 - first
+    ends = df["Finish"].dt.to_period(freq).array.asi8 - first
+    # Tasks whose deadline is before their start still occupy their first period
+    ends = np.maximum(starts, ends)
+
+    diff = np.zeros((len(lane_index), len(periods) + 1), dtype=np.int64)
+    np.add.at(diff, (rows, starts), 1)
+    np.add.at(diff, (rows, ends + 1), -1)
+    active = np.cumsum(diff, axis=1)[:, :-1]
+
+    fig = go.Figure(go.Heatmap(
+        z=active,
+        x=periods.start_time,
+        y=lane_index,
+        colorscale="Blues",
+        colorbar_title_text="Tasks",
+        hovertemplate="%{y}<br>Week of %{x|%Y-%m-%d}<br>%{z} tasks<extra></extra>",
+    ))
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(autorange="reversed")
+    fig.update_layout(xaxis_title="Date", yaxis_title="Category · Priority", height=max(300, 40 * len(lane_index) + 120))
+    return fig
+
+
+def build_segment_figure(df):
+    """One WebGL line segment per task, for more tasks than bars can handle.
+
+    Rows are numbered instead of labelled with task names (names appear on
+    hover); each trace is a single Scattergl with None between segments.
+    """
+    fig = go.Figure()
+    priorities = df["Priority"].to_numpy()
+    rows = np.arange(len(df))
+    starts = df["Start"].to_numpy()
+    finishes = df["Finish"].to_numpy()
+    names = df["Task"].to_numpy()
+    for priority in _ordered_priorities(priorities):
+        mask = priorities == priority
+        if not mask.any():
+            continue
+        count = int(mask.sum())
+        x = np.empty(count * 3, dtype=object)
+        x[0::3] = starts[mask]
+        x[1::3] = finishes[mask]
+        x[2::3] = None
+        y = np.empty(count * 3, dtype=object)
+        y[0::3] = rows[mask]
+        y[1::3] = rows[mask]
+        y[2::3] = None
+        text = np.repeat(names[mask], 3)
+        fig.add_trace(go.Scattergl(
+            name=str(priority),
+            x=x,
+            y=y,
+            text=text,
+            mode="lines",
+            line={"color": PRIORITY_COLORS.get(priority), "width": 3},
+            hovertemplate="<b>%{text}</b><br>%{x|%Y-%m-%d}<extra>%{fullData.name}</extra>",
+        ))
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(autorange="reversed", showticklabels=False)
+    fig.update_layout(xaxis_title="Date", yaxis_title="Task", legend_title_text="Priority")
+    return fig
+
+
+@traced
+def build_detail_figure(df):
+    """Bars when there are few enough tasks, WebGL segments otherwise."""
+    if len(df) <= DETAIL_LIMIT:
+        return build_gantt_figure(df)
+    return build_segment_figure(df)
@@ -0,0 +1,35 @@
+from .archive import archive_tasks, restore_tasks, start_archiver, trim_change_log
+from .cache import TaskCache
+from .columnar import load_task_frame
+from .db import ConnectionPool, connection, get_pool, set_pool, transaction
+from .export import export_tasks, export_to_csv
+from .migrations import init_db
+from .queries import PRIORITIES, TaskFilter, deadline_range
+from .tasks import (
+    Changes,
+    ConflictError,
+    Task,
+    add_task,
+    add_tasks,
+    changes_since,
+    delete_task,
+    delete_tasks,
+    edit_task,
+    get_categories,
+    get_category_usage,
+    get_revision,
+    get_task,
+    get_task_counts,
+    get_tasks,
+    list_tasks,
+    list_tasks_page,
+    materialize_occurrences,
+    prune_changes,
+    rename_category,
+    search_tasks,
+    set_category,
+    set_priority,
+    set_recurrence,
+    update_task_status,
+    update_tasks_status,
+)
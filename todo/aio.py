@@ -0,0 +1,65 @@
+"""Async versions of the task helpers, for the API and background jobs.
+
+Reads run in a worker thread on a pooled connection. Writes go to the
+shared Writer thread, which commits concurrent writes from all callers
+together, so awaiting many of them at once costs a few commits, not one each.
+"""
+import asyncio
+import functools
+
+from . import archive, tasks
+from .writer import get_writer
+
+
+async def read(func, *args, **kwargs):
+    """Await ``func(*args)`` run in a worker thread."""
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+async def write(func, *args, **kwargs):
+    """Await ``func(*args)`` run and committed by the writer thread."""
+    return await asyncio.wrap_future(get_writer().submit(func, *args, **kwargs))
+
+
+def _reader(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await read(func, *args, **kwargs)
+    return wrapper
+
+
+def _writer(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await write(func, *args, **kwargs)
+    return wrapper
+
+
+get_task = _reader(tasks.get_task)
+get_tasks = _reader(tasks.get_tasks)
+list_tasks = _reader(tasks.list_tasks)
+list_tasks_page = _reader(tasks.list_tasks_page)
+get_task_counts = _reader(tasks.get_task_counts)
+search_tasks = _reader(tasks.search_tasks)
+get_categories = _reader(tasks.get_categories)
+get_category_usage = _reader(tasks.get_category_usage)
+get_revision = _reader(tasks.get_revision)
+changes_since = _reader(tasks.changes_since)
+# Reads first, and only queues a write when occurrences are due
+materialize_occurrences = _reader(tasks.materialize_occurrences)
+# Queues one write per batch, so other writes go in between
+archive_tasks = _reader(archive.archive_tasks)
+
+add_task = _writer(tasks.add_task)
+add_tasks = _writer(tasks.add_tasks)
+edit_task = _writer(tasks.edit_task)
+update_task_status = _writer(tasks.update_task_status)
+delete_task = _writer(tasks.delete_task)
+update_tasks_status = _writer(tasks.update_tasks_status)
+delete_tasks = _writer(tasks.delete_tasks)
+set_category = _writer(tasks.set_category)
+set_priority = _writer(tasks.set_priority)
+prune_changes = _writer(tasks.prune_changes)
+rename_category = _writer(tasks.rename_category)
+set_recurrence = _writer(tasks.set_recurrence)
+restore_tasks = _writer(archive.restore_tasks)
@@ -0,0 +1,453 @@
+"""JSON HTTP API over the task helpers, for scripts and integrations.
+
+    python -m todo.api [--host 127.0.0.1] [--port 8000] [--db todo.db]
+
+Needs starlette and uvicorn (pip install starlette uvicorn). The server uses
+the same database as the Streamlit UI and can run next to it; WAL lets both
+read while either writes.
+
+    GET    /tasks                  filtered page: ?search= &priority= &category=
+                                   &deadline_from= &deadline_to= &done= &limit= &after=
+                                   &archived=true lists the archive instead;
+                                   "revision" is where to start polling /changes
+    POST   /tasks                  create one task
+    GET    /tasks/{id}
+    PATCH  /tasks/{id}             change some fields; with "version", only if the
+                                   task is still at that version (409 otherwise)
+                                   "recurrence" (POST and PATCH) is a repeat rule
+                                   such as "weekly", see todo.recurrence
+    DELETE /tasks/{id}
+    POST   /tasks/batch            {"tasks": [...]} create many in one transaction
+    POST   /tasks/batch/{action}   {"ids": [...], "value": ...}, action is one of
+                                   complete, reopen, delete, priority, category,
+                                   restore (archived tasks)
+    GET    /changes?since=N        tasks changed after revision N (410 if the log
+                                   no longer reaches back that far)
+    GET    /categories             names and number of tasks of every category
+    POST   /categories/{name}/rename
+                                   {"name": ...} move its tasks to another category,
+                                   merging the two if that one exists
+    POST   /archive                {"days": N} archive tasks done more than N days ago
+    GET    /stats
+
+Writes from concurrent requests are committed together by the writer thread
+(see todo.writer). With TODO_ARCHIVE_DAYS set, old completed tasks are
+archived in the background (see todo.archive). GET responses carry an ETag
+from the task revision counter; a request with a matching If-None-Match gets
+304 Not Modified without running the query.
+"""
+import argparse
+import base64
+import binascii
+import contextlib
+import json
+import sqlite3
+import sys
+
+from . import aio
+from .archive import ARCHIVE_AFTER_DAYS, AUTO_ARCHIVE, archive_tasks, restore_tasks, start_archiver
+from .db import DB_PATH, ConnectionPool, set_pool, transaction
+from .importer import normalize
+from .migrations import init_db
+from .queries import TaskFilter, sort_key_length, to_iso
+from .recurrence import normalize_rule
+from .stats import get_category_stats, get_summary
+from .tasks import (
+    ConflictError,
+    add_task,
+    add_tasks,
+    changes_since,
+    delete_task,
+    delete_tasks,
+    edit_task,
+    get_category_usage,
+    get_revision,
+    get_task,
+    get_task_counts,
+    list_tasks_page,
+    materialize_occurrences,
+    rename_category,
+    set_category,
+    set_priority,
+    set_recurrence,
+    update_task_status,
+    update_tasks_status,
+)
+from .writer import get_writer
+
+try:
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+except ImportError:
+    Starlette = None
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def task_json(task):
+    record = task._asdict()
+    record['deadline'] = task.deadline.isoformat() if task.deadline else None
+    record['start_date'] = task.start_date.isoformat() if task.start_date else None
+    return record
+
+
+def _record(task):
+    # A task as a normalize() input record
+    return {key: value for key, value in task_json(task).items() if key not in ('id', 'version', 'updated_at', 'recurrence', 'series_id', 'overdue')}
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, length):
+    """The sort key in ``token``, which must have ``length`` plain values."""
+    if not token:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError(400, "invalid 'after' cursor")
+    # Anything else would reach SQLite as a bad parameter
+    if not isinstance(cursor, list) or len(cursor) != length or not all(
+        value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool)) for value in cursor
+    ):
+        raise ApiError(400, "invalid 'after' cursor")
+    return tuple(cursor)
+
+
+def _values(params, name):
+    # Repeated (?priority=High&priority=Low) or comma separated values
+    return tuple(value for item in params.getlist(name) for value in item.split(',') if value)
+
+
+def _bool_param(params, name):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    if value.lower() in TRUE_VALUES:
+        return True
+    if value.lower() in FALSE_VALUES:
+        return False
+    raise ApiError(400, f"invalid {name} value {value!r}, expected true or false")
+
+
+def _int_param(params, name, default, minimum, maximum):
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"invalid {name} value {value!r}")
+    if not minimum <= number <= maximum:
+        raise ApiError(400, f"{name} must be between {minimum} and {maximum}")
+    return number
+
+
+def task_filter_from(params):
+    return TaskFilter(
+        search=params.get('search', ''),
+        priorities=_values(params, 'priority'),
+        categories=_values(params, 'category'),
+        deadline_from=params.get('deadline_from') or None,
+        deadline_to=params.get('deadline_to') or None,
+        done=_bool_param(params, 'done'),
+        archived=bool(_bool_param(params, 'archived')),
+    )
+
+
+def _etag(revision):
+    return f'W/"{revision}"'
+
+
+def _not_modified(request, etag):
+    return etag in (tag.strip() for tag in request.headers.get('if-none-match', '').split(','))
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        raise ApiError(400, "request body must be JSON")
+
+
+def _ids(body):
+    ids = body.get('ids') if isinstance(body, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(task_id, int) for task_id in ids):
+        raise ApiError(400, "'ids' must be a list of task ids")
+    return ids
+
+
+def _cached_get(read):
+    """GET handler for ``read(request)`` with revision based conditional GETs."""
+    async def endpoint(request):
+        # Create due occurrences of recurring tasks first, so they are part
+        # of this revision (one indexed read when there are none)
+        await aio.read(materialize_occurrences)
+        # Read the revision before the data: if a write lands in between the
+        # ETag is older than the body, so a client can't get a stale 304
+        request.state.revision = await aio.read(get_revision)
+        etag = _etag(request.state.revision)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={'ETag': etag})
+        return JSONResponse(await read(request), headers={'ETag': etag})
+    return endpoint
+
+
+async def read_tasks(request):
+    params = request.query_params
+    task_filter = task_filter_from(params)
+    limit = _int_param(params, 'limit', DEFAULT_LIMIT, 1, MAX_LIMIT)
+    after = decode_cursor(params.get('after'), sort_key_length(task_filter))
+    tasks, next_cursor = await aio.read(list_tasks_page, task_filter, after, limit)
+    total, done = await aio.read(get_task_counts, task_filter)
+    return {
+        'tasks': [task_json(task) for task in tasks],
+        # Where to start polling /changes from; read before the tasks, so
+        # nothing changed after it is missing from them
+        'revision': request.state.revision,
+        'next': encode_cursor(next_cursor),
+        'total': total,
+        'done': done,
+    }
+
+
+async def read_task(request):
+    task = await aio.read(get_task, request.path_params['task_id'])
+    if task is None:
+        raise ApiError(404, "task not found")
+    return task_json(task)
+
+
+async def read_changes(request):
+    since = _int_param(request.query_params, 'since', None, 0, 2 ** 63 - 1)
+    if since is None:
+        raise ApiError(400, "'since' revision is required")
+    changes = await aio.read(changes_since, since)
+    if changes is None:
+        raise ApiError(410, "changes since that revision are no longer available, reload all tasks")
+    return {
+        'revision': changes.revision,
+        'tasks': [task_json(task) for task in changes.tasks],
+        'deleted': changes.deleted,
+    }
+
+
+async def read_categories(request):
+    usage = await aio.read(get_category_usage)
+    return {'categories': [{'name': name, 'tasks': tasks} for name, tasks in usage]}
+
+
+async def read_stats(request):
+    summary = await aio.read(get_summary)
+    categories = await aio.read(get_category_stats)
+    return {
+        'summary': summary._asdict(),
+        'categories': [group._asdict() for group in categories],
+    }
+
+
+def _rule(record):
+    rule = record.get('recurrence')
+    if rule is not None and not isinstance(rule, str):
+        raise ValueError("recurrence must be a rule string or null")
+    return normalize_rule(rule)
+
+
+def _create(record):
+    name, done, priority, deadline, note, category, start_date = normalize(record)
+    with transaction():
+        task_id = add_task(name, priority, deadline, note, category, start_date)
+        if done:
+            update_task_status(task_id, True)
+        if record.get('recurrence'):
+            set_recurrence(task_id, _rule(record))
+    return get_task(task_id)
+
+
+def _update(task_id, changes):
+    with transaction():
+        task = get_task(task_id)
+        if task is None:
+            raise ApiError(404, "task not found")
+        name, done, priority, deadline, note, category, start_date = normalize(dict(_record(task), **changes))
+        edit_task(task_id, name, priority, deadline, note, category, start_date, changes.get('version'))
+        if done != task.done:
+            update_task_status(task_id, done)
+        # A new rule, or new dates of a recurring task, replace its upcoming
+        # occurrences
+        rule = _rule(changes) if 'recurrence' in changes else task.recurrence
+        if rule != task.recurrence or (rule and (deadline, start_date) != (to_iso(task.deadline), to_iso(task.start_date))):
+            set_recurrence(task_id, rule)
+    return get_task(task_id)
+
+
+async def create_task(request):
+    body = await _json_body(request)
+    if not isinstance(body, dict):
+        raise ApiError(400, "expected a JSON object")
+    task = await aio.write(_create, body)
+    return JSONResponse(task_json(task), status_code=201, headers={'Location': f'/tasks/{task.id}'})
+
+
+async def update_task(request):
+    body = await _json_body(request)
+    if not isinstance(body, dict):
+        raise ApiError(400, "expected a JSON object")
+    task = await aio.write(_update, request.path_params['task_id'], body)
+    return JSONResponse(task_json(task))
+
+
+async def remove_task(request):
+    if not await aio.write(delete_task, request.path_params['task_id']):
+        raise ApiError(404, "task not found")
+    return Response(status_code=204)
+
+
+async def create_tasks(request):
+    body = await _json_body(request)
+    records = body.get('tasks') if isinstance(body, dict) else None
+    if not isinstance(records, list):
+        raise ApiError(400, "'tasks' must be a list of task objects")
+    rows, rejected = [], []
+    for index, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            rows.append(normalize(record))
+        except ValueError as e:
+            rejected.append({'index': index, 'error': str(e)})
+    # All or nothing, so a client can fix the listed records and resend
+    if rejected:
+        return JSONResponse({'error': "invalid tasks", 'rejected': rejected}, status_code=422)
+    return JSONResponse({'created': await aio.write(add_tasks, rows)}, status_code=201)
+
+
+BATCH_ACTIONS = {
+    'complete': lambda ids, value: update_tasks_status(ids, True),
+    'reopen': lambda ids, value: update_tasks_status(ids, False),
+    'delete': lambda ids, value: delete_tasks(ids),
+    'priority': set_priority,
+    'category': set_category,
+    'restore': lambda ids, value: restore_tasks(ids),
+}
+
+
+async def batch_action(request):
+    action = BATCH_ACTIONS.get(request.path_params['action'])
+    if action is None:
+        raise ApiError(404, f"unknown batch action, expected one of {', '.join(BATCH_ACTIONS)}")
+    body = await _json_body(request)
+    ids = _ids(body)
+    value = body.get('value')
+    if request.path_params['action'] in ('priority', 'category') and not isinstance(value, str):
+        raise ApiError(400, "'value' must be a string")
+    return JSONResponse({'updated': await aio.write(action, ids, value)})
+
+
+async def rename(request):
+    body = await _json_body(request)
+    name = body.get('name') if isinstance(body, dict) else None
+    if not isinstance(name, str) or not name.strip():
+        raise ApiError(400, "'name' must be a non-empty string")
+    return JSONResponse({'updated': await aio.write(rename_category, request.path_params['name'], name.strip())})
+
+
+async def archive(request):
+    body = await _json_body(request)
+    days = body.get('days', ARCHIVE_AFTER_DAYS) if isinstance(body, dict) else None
+    if not isinstance(days, int) or isinstance(days, bool) or days < 0:
+        raise ApiError(400, "'days' must be a number of days")
+    # Each batch is queued to the writer on its own, so this doesn't hold up
+    # other requests' writes
+    return JSONResponse({'archived': await aio.read(archive_tasks, days)})
+
+
+async def api_error(request, exc):
+    return JSONResponse({'error': str(exc)}, status_code=exc.status)
+
+
+async def conflict(request, exc):
+    return JSONResponse({'error': str(exc), 'task': task_json(exc.task)}, status_code=409)
+
+
+async def invalid_value(request, exc):
+    # Validation in normalize() and the batch helpers, and the date triggers
+    return JSONResponse({'error': str(exc)}, status_code=422)
+
+
+def create_app(db_path=None):
+    """The API as an ASGI app, using ``db_path`` or the current pool."""
+    if Starlette is None:
+        raise RuntimeError("The API needs the starlette package (pip install starlette uvicorn)")
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        if db_path:
+            set_pool(ConnectionPool(db_path))
+        init_db()
+        archiver = start_archiver() if AUTO_ARCHIVE else None
+        yield
+        if archiver:
+            # Let a batch in progress finish before the writer stops
+            stop, thread = archiver
+            stop.set()
+            thread.join()
+        get_writer().close()
+
+    routes = [
+        Route('/tasks', _cached_get(read_tasks), methods=['GET']),
+        Route('/tasks', create_task, methods=['POST']),
+        Route('/tasks/batch', create_tasks, methods=['POST']),
+        Route('/tasks/batch/{action}', batch_action, methods=['POST']),
+        Route('/tasks/{task_id:int}', _cached_get(read_task), methods=['GET']),
+        Route('/tasks/{task_id:int}', update_task, methods=['PATCH']),
+        Route('/tasks/{task_id:int}', remove_task, methods=['DELETE']),
+        Route('/changes', _cached_get(read_changes), methods=['GET']),
+        Route('/categories', _cached_get(read_categories), methods=['GET']),
+        Route('/categories/{name}/rename', rename, methods=['POST']),
+        Route('/archive', archive, methods=['POST']),
+        Route('/stats', _cached_get(read_stats), methods=['GET']),
+    ]
+    return Starlette(
+        routes=routes,
+        exception_handlers={
+            ApiError: api_error,
+            ConflictError: conflict,
+            ValueError: invalid_value,
+            sqlite3.IntegrityError: invalid_value,
+        },
+        lifespan=lifespan,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the task JSON API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--db', default=DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        print("Serving the API needs the uvicorn package (pip install uvicorn)", file=sys.stderr)
+        return 1
+    uvicorn.run(create_app(args.db), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Move tasks completed long ago out of the tasks table.
+
+Archived tasks live in tasks_archive with their ids, so the active table,
+its indexes and everything that scans it only hold current work. They can
+still be listed (``TaskFilter(archived=True)``), exported and restored.
+
+Archiving runs in batches, each its own write on the writer thread, so a
+large backlog never holds the write lock for long and other writes go in
+between batches. Set TODO_ARCHIVE_DAYS to have the app and the API archive
+in a background thread, which also trims the change log to the last
+TODO_CHANGE_LOG_SIZE revisions.
+"""
+import datetime
+import os
+import threading
+import traceback
+
+from .db import transaction
+from .migrations import ARCHIVE_COLUMNS
+from .profiling import traced
+from .queries import NOW_SQL
+from .tasks import get_revision, prune_changes
+from .writer import serialized
+
+# Days a task stays done before it is archived. The app and the API only
+# archive in the background when TODO_ARCHIVE_DAYS is set.
+ARCHIVE_AFTER_DAYS = int(os.environ.get('TODO_ARCHIVE_DAYS') or 30)
+AUTO_ARCHIVE = bool(os.environ.get('TODO_ARCHIVE_DAYS'))
+# Revisions of the change log kept for changes_since clients; one further
+# behind reloads everything
+CHANGE_LOG_SIZE = int(os.environ.get('TODO_CHANGE_LOG_SIZE') or 10000)
+# Seconds between background runs
+ARCHIVE_INTERVAL = 3600
+# Tasks moved per transaction
+BATCH_SIZE = 500
+
+# Recurring tasks hold their series' rule, so they stay active. Left to
+# itself the planner prefers the done column of the display order index and
+# sorts every completed task for each batch.
+SELECT_ARCHIVABLE_SQL = '''
+    SELECT id FROM tasks INDEXED BY idx_tasks_completed
+    WHERE done = 1 AND completed_at < ? AND recurrence IS NULL
+    ORDER BY completed_at LIMIT ?
+'''
+ARCHIVE_TASK_SQL = f'''
+    INSERT INTO tasks_archive ({ARCHIVE_COLUMNS}, archived_at)
+    SELECT {ARCHIVE_COLUMNS}, {NOW_SQL} FROM tasks WHERE id = ?
+'''
+DELETE_TASK_SQL = 'DELETE FROM tasks WHERE id = ?'
+# The series an occurrence belonged to may be gone by now
+RESTORE_TASK_SQL = f'''
+    INSERT INTO tasks ({ARCHIVE_COLUMNS})
+    SELECT id, name, done, priority, deadline, note, category, start_date, version, updated_at, recurrence,
+           (SELECT tasks.id FROM tasks WHERE tasks.id = tasks_archive.series_id), completed_at
+    FROM tasks_archive WHERE id = ?
+'''
+DELETE_ARCHIVED_SQL = 'DELETE FROM tasks_archive WHERE id = ?'
+
+
+@serialized
+def _archive_batch(cutoff, batch_size):
+    with transaction() as conn:
+        ids = [(row[0],) for row in conn.execute(SELECT_ARCHIVABLE_SQL, (cutoff, batch_size))]
+        conn.executemany(ARCHIVE_TASK_SQL, ids)
+        conn.executemany(DELETE_TASK_SQL, ids)
+    return len(ids)
+
+
+@traced
+def archive_tasks(days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE, now=None):
+    """Archive tasks completed more than ``days`` ago; return how many."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    # completed_at is stored like NOW_SQL, so the cutoff compares as text
+    cutoff = (now - datetime.timedelta(days=days)).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    total = 0
+    while True:
+        moved = _archive_batch(cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+@traced
+@serialized
+def restore_tasks(task_ids):
+    """Move archived tasks back to the active tasks; return how many."""
+    with transaction() as conn:
+        params = [(task_id,) for task_id in task_ids]
+        count = conn.executemany(RESTORE_TASK_SQL, params).rowcount
+        conn.executemany(DELETE_ARCHIVED_SQL, params)
+    return count
+
+
+@traced
+def trim_change_log(keep=CHANGE_LOG_SIZE):
+    """Prune the change log to the last ``keep`` revisions; return how many
+    entries were dropped."""
+    if keep < 0:
+        raise ValueError(f"keep must not be negative, got {keep!r}")
+    return prune_changes(get_revision() - keep)
+
+
+def start_archiver(days=ARCHIVE_AFTER_DAYS, interval=ARCHIVE_INTERVAL, keep=CHANGE_LOG_SIZE):
+    """Run ``archive_tasks(days)`` and ``trim_change_log(keep)`` now and
+    every ``interval`` seconds in a daemon thread, on the current pool.
+
+    Returns (stop, thread): set the Event to stop it, then join the thread
+    to wait for a batch in progress.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            try:
+                archive_tasks(days)
+                trim_change_log(keep)
+            except Exception:
+                # Try again next time, e.g. after a locked database
+                traceback.print_exc()
+            stop.wait(interval)
+
+    thread = threading.Thread(target=run, name='todo-archiver', daemon=True)
+    thread.start()
+    return stop, thread
@@ -0,0 +1,53 @@
+import collections
+
+from .tasks import get_revision
+
+
+class TaskCache:
+    """Memoizes task reads until the database changes.
+
+    Entries are only valid for the revision they were read at. The revision
+    is bumped by triggers on every insert, update and delete of a task, so a
+    write through any helper (or any other process) invalidates exactly when
+    data changed, while reruns that only touch widgets are served from memory.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.revision = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = collections.OrderedDict()
+
+    def call(self, func, *args):
+        """Return ``func(*args)``, cached. Arguments must be hashable."""
+        revision = get_revision()
+        if revision != self.revision:
+            self.invalidate()
+            self.revision = revision
+        key = (func.__qualname__, args)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        value = func(*args)
+        self._entries[key] = value
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'entries': len(self._entries),
+            'revision': self.revision,
+        }
@@ -0,0 +1,378 @@
+"""Command line interface to the task database.
+
+    todo add "Write report" --priority High --deadline 2024-06-01
+    todo list --open --due week
+    todo done 12 15
+    todo archive --days 30
+    todo batch < commands.txt
+
+Only the backend is imported, so a command starts in well under 100 ms.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import shlex
+import sqlite3
+import sys
+
+from .archive import (
+    ARCHIVE_AFTER_DAYS,
+    BATCH_SIZE as ARCHIVE_BATCH_SIZE,
+    CHANGE_LOG_SIZE,
+    archive_tasks,
+    restore_tasks,
+    trim_change_log,
+)
+from .db import DB_PATH, ConnectionPool, set_pool
+from .export import FORMATS as EXPORT_FORMATS, export_tasks
+from .importer import BATCH_SIZE as IMPORT_BATCH_SIZE, FORMATS as IMPORT_FORMATS, import_tasks
+from .migrations import init_db
+from .queries import PRIORITIES, TaskFilter, deadline_range
+from .tasks import (
+    ConflictError,
+    add_task,
+    delete_tasks,
+    edit_task,
+    get_category_usage,
+    get_task,
+    list_tasks_page,
+    materialize_occurrences,
+    rename_category,
+    search_tasks,
+    set_recurrence,
+    update_tasks_status,
+)
+from .writer import get_writer
+
+
+class CommandError(Exception):
+    pass
+
+
+# Tasks fetched per query while listing, so output starts right away and
+# memory stays flat however many tasks match
+PAGE_SIZE = 1000
+# Failures reported as a message instead of a traceback: bad input, a
+# concurrent edit, and the date checks of the schema
+ERRORS = (CommandError, ConflictError, ValueError, sqlite3.IntegrityError)
+DUE_OPTIONS = {'today': "Today", 'week': "This Week", 'overdue': "Overdue"}
+LIST_FORMATS = ('table', 'tsv', 'jsonl')
+
+
+def iter_tasks(task_filter, limit=None, page_size=PAGE_SIZE):
+    """Yield the tasks matching ``task_filter`` page by page."""
+    after = None
+    while True:
+        size = page_size if limit is None else min(page_size, limit)
+        tasks, after = list_tasks_page(task_filter, after, size)
+        yield from tasks
+        if limit is not None:
+            limit -= len(tasks)
+            if limit <= 0:
+                return
+        if after is None:
+            return
+
+
+def _date(value):
+    return value.isoformat() if value else ''
+
+
+def format_task(task, fmt):
+    if fmt == 'jsonl':
+        record = task._asdict()
+        record['deadline'] = _date(task.deadline) or None
+        record['start_date'] = _date(task.start_date) or None
+        return json.dumps(record, ensure_ascii=False)
+    if fmt == 'tsv':
+        fields = (task.id, int(task.done), task.priority, _date(task.deadline), task.category or '', task.name)
+        return '\t'.join(str(field) for field in fields)
+    mark = 'x' if task.done else ('!' if task.overdue else ' ')
+    repeats = '\u21bb ' if task.recurrence or task.series_id else ''
+    return f"{task.id:>6} [{mark}] {task.priority or '':<6} {_date(task.deadline) or '-':<10} {task.category or '':<12} {repeats}{task.name}"
+
+
+def write_tasks(tasks, fmt, out):
+    for task in tasks:
+        out.write(format_task(task, fmt) + '\n')
+
+
+def _date_arg(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"invalid count {value!r}, expected a positive number")
+    return number
+
+
+def _add(args):
+    task_id = add_task(args.name, args.priority, args.deadline, args.note, args.category, args.start)
+    if args.repeat:
+        set_recurrence(task_id, args.repeat)
+    return task_id
+
+
+def cmd_add(args, out):
+    # Compound writes run as one operation on the writer thread, which
+    # commits both or neither
+    out.write(f"{get_writer().call(_add, args)}\n")
+
+
+def cmd_list(args, out):
+    criteria = deadline_range(DUE_OPTIONS[args.due]) if args.due else {}
+    if args.done or args.open:
+        criteria['done'] = args.done
+    task_filter = TaskFilter(
+        search=args.search or '',
+        priorities=tuple(args.priority or ()),
+        categories=tuple(args.category or ()),
+        archived=args.archived,
+        **criteria,
+    )
+    materialize_occurrences()
+    write_tasks(iter_tasks(task_filter, args.limit), args.format, out)
+
+
+def cmd_search(args, out):
+    materialize_occurrences()
+    write_tasks(search_tasks(' '.join(args.text), args.limit), args.format, out)
+
+
+def cmd_done(args, out):
+    changed = update_tasks_status(args.ids, not args.undo)
+    if changed < len(args.ids):
+        raise CommandError(f"{len(args.ids) - changed} of {len(args.ids)} tasks not found")
+
+
+def cmd_delete(args, out):
+    changed = delete_tasks(args.ids)
+    if changed < len(args.ids):
+        raise CommandError(f"{len(args.ids) - changed} of {len(args.ids)} tasks not found")
+
+
+def _edit(args):
+    task = get_task(args.id)
+    if task is None:
+        raise CommandError(f"task {args.id} not found")
+    edit_task(
+        task.id,
+        args.name if args.name is not None else task.name,
+        args.priority or task.priority,
+        args.deadline if args.deadline is not None else task.deadline,
+        args.note if args.note is not None else task.note,
+        args.category if args.category is not None else task.category,
+        args.start if args.start is not None else task.start_date,
+        expected_version=task.version,
+    )
+    # A new rule, or new dates of a recurring task, replace its upcoming
+    # occurrences
+    if args.repeat is not None or (task.recurrence and (args.deadline or args.start)):
+        set_recurrence(task.id, task.recurrence if args.repeat is None else args.repeat)
+
+
+def cmd_edit(args, out):
+    get_writer().call(_edit, args)
+
+
+def cmd_archive(args, out):
+    out.write(f"{archive_tasks(args.days, args.batch_size)}\n")
+
+
+def cmd_restore(args, out):
+    changed = restore_tasks(args.ids)
+    if changed < len(args.ids):
+        raise CommandError(f"{len(args.ids) - changed} of {len(args.ids)} tasks not found in the archive")
+
+
+def cmd_trim_changes(args, out):
+    out.write(f"{trim_change_log(args.keep)}\n")
+
+
+def cmd_categories(args, out):
+    for name, tasks in get_category_usage():
+        out.write(f"{tasks:>6} {name}\n")
+
+
+def cmd_rename_category(args, out):
+    out.write(f"{rename_category(args.old, args.new)}\n")
+
+
+def cmd_export(args, out):
+    if args.file in (None, '-'):
+        out.flush()
+        export_tasks(sys.stdout.buffer, args.format, include_archive=args.include_archive)
+    else:
+        export_tasks(args.file, args.format, include_archive=args.include_archive)
+
+
+def cmd_import(args, out):
+    if args.file == '-':
+        report = import_tasks(sys.stdin, args.format or 'csv', args.batch_size)
+    else:
+        report = import_tasks(args.file, args.format, args.batch_size)
+    print(report.summary(), file=sys.stderr)
+    for line, reason in report.rejected:
+        print(f"  line {line}: {reason}", file=sys.stderr)
+    if report.rejected:
+        raise CommandError(f"{len(report.rejected)} rows rejected")
+
+
+def _run_batch(commands):
+    buffer = io.StringIO()
+    for line_number, command in commands:
+        try:
+            command.func(command, buffer)
+        except ERRORS as e:
+            raise CommandError(f"line {line_number}: {e}; nothing was applied")
+    return buffer.getvalue()
+
+
+def cmd_batch(args, out):
+    # Every command runs in one operation on the writer thread: all of them
+    # are applied, or none if any fails. Output is held back until the
+    # commit, so no ids of rolled back tasks get printed. The input is read
+    # and parsed first, so the write lock isn't held while waiting on stdin.
+    parser = build_parser(batch=True)
+    commands = []
+    for line_number, line in enumerate(sys.stdin, start=1):
+        argv = shlex.split(line, comments=True)
+        if not argv:
+            continue
+        try:
+            commands.append((line_number, parser.parse_args(argv)))
+        except SystemExit:
+            raise CommandError(f"line {line_number}: invalid command; nothing was applied")
+    out.write(get_writer().call(_run_batch, commands))
+
+
+def _add_task_options(parser, required_name):
+    if required_name:
+        parser.add_argument('name')
+    else:
+        parser.add_argument('--name')
+    parser.add_argument('--priority', choices=PRIORITIES, default="Medium" if required_name else None)
+    parser.add_argument('--deadline', type=_date_arg)
+    parser.add_argument('--start', type=_date_arg, help="start date")
+    parser.add_argument('--note')
+    parser.add_argument('--category', default="General" if required_name else None)
+    parser.add_argument('--repeat', help="daily, weekly, monthly, yearly or an RRULE such as "
+                        "'FREQ=WEEKLY;BYDAY=MO,TH'" + ("" if required_name else "; 'none' stops repeating"))
+
+
+def build_parser(batch=False):
+    parser = argparse.ArgumentParser(prog='todo', description="Manage tasks from the command line")
+    if not batch:
+        parser.add_argument('--db', default=DB_PATH, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="add a task, prints its id")
+    _add_task_options(add, required_name=True)
+    add.set_defaults(func=cmd_add)
+
+    list_ = commands.add_parser('list', help="list tasks in display order")
+    list_.add_argument('--search')
+    list_.add_argument('--priority', action='append', choices=PRIORITIES)
+    list_.add_argument('--category', action='append')
+    status = list_.add_mutually_exclusive_group()
+    status.add_argument('--done', action='store_true', help="only completed tasks")
+    status.add_argument('--open', action='store_true', help="only open tasks")
+    list_.add_argument('--due', choices=DUE_OPTIONS)
+    list_.add_argument('--limit', type=_positive_int)
+    list_.add_argument('--format', choices=LIST_FORMATS, default='table')
+    list_.add_argument('--archived', action='store_true', help="list archived tasks instead")
+    list_.set_defaults(func=cmd_list)
+
+    search = commands.add_parser('search', help="full text search in names and notes")
+    search.add_argument('text', nargs='+')
+    search.add_argument('--limit', type=_positive_int, default=50)
+    search.add_argument('--format', choices=LIST_FORMATS, default='table')
+    search.set_defaults(func=cmd_search)
+
+    done = commands.add_parser('done', help="mark tasks done")
+    done.add_argument('ids', type=int, nargs='+')
+    done.add_argument('--undo', action='store_true', help="reopen them instead")
+    done.set_defaults(func=cmd_done)
+
+    delete = commands.add_parser('delete', help="delete tasks")
+    delete.add_argument('ids', type=int, nargs='+')
+    delete.set_defaults(func=cmd_delete)
+
+    edit = commands.add_parser('edit', help="change fields of a task")
+    edit.add_argument('id', type=int)
+    _add_task_options(edit, required_name=False)
+    edit.set_defaults(func=cmd_edit)
+
+    archive = commands.add_parser('archive', help="move tasks done long ago to the archive, prints how many")
+    archive.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                         help="archive tasks completed more than this many days ago (default: %(default)s)")
+    archive.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE)
+    archive.set_defaults(func=cmd_archive)
+
+    restore = commands.add_parser('restore', help="move archived tasks back to the active tasks")
+    restore.add_argument('ids', type=int, nargs='+')
+    restore.set_defaults(func=cmd_restore)
+
+    trim = commands.add_parser('trim-changes', help="prune the change log, prints how many entries were dropped")
+    trim.add_argument('--keep', type=int, default=CHANGE_LOG_SIZE,
+                      help="revisions to keep for clients syncing changes (default: %(default)s)")
+    trim.set_defaults(func=cmd_trim_changes)
+
+    categories = commands.add_parser('categories', help="list categories with their number of tasks")
+    categories.set_defaults(func=cmd_categories)
+
+    rename = commands.add_parser('rename-category', help="move all tasks of a category to another, prints how many")
+    rename.add_argument('old')
+    rename.add_argument('new', help="new name, or an existing category to merge into")
+    rename.set_defaults(func=cmd_rename_category)
+
+    if batch:
+        return parser
+
+    export = commands.add_parser('export', help="export every task")
+    export.add_argument('file', nargs='?', help="output file (default: stdout)")
+    export.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    export.add_argument('--include-archive', action='store_true', help="export archived tasks too")
+    export.set_defaults(func=cmd_export)
+
+    import_ = commands.add_parser('import', help="import tasks from CSV or JSON Lines")
+    import_.add_argument('file', help="file to import, '-' for stdin")
+    import_.add_argument('--format', choices=IMPORT_FORMATS, help="input format (default: from the file extension)")
+    import_.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    import_.set_defaults(func=cmd_import)
+
+    batch_ = commands.add_parser('batch', help="run commands read from stdin, one per line, in one transaction")
+    batch_.set_defaults(func=cmd_batch)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    set_pool(ConnectionPool(args.db))
+    init_db()
+    try:
+        args.func(args, sys.stdout)
+        sys.stdout.flush()
+    except ERRORS as e:
+        print(f"todo: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+
+from . import profiling
+
+DB_PATH = os.environ.get('TODO_DB', 'todo.db')
+# How long a connection waits for another process's write lock, in ms
+BUSY_TIMEOUT = int(os.environ.get('TODO_BUSY_TIMEOUT', 5000))
+
+# Applied to every new connection. WAL lets readers and the writer work at the
+# same time, and synchronous=NORMAL is safe with WAL (only the last commit can
+# be lost on power failure, the database is never corrupted).
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('foreign_keys', 'ON'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', -16000),      # 16 MB page cache per connection
+    ('mmap_size', 134217728),    # 128 MB memory mapped reads
+    ('busy_timeout', BUSY_TIMEOUT),
+)
+
+# sqlite3 keeps compiled statements in a per-connection LRU keyed by the SQL
+# text, so helpers must use constant SQL strings to get them reused.
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(
+        path,
+        isolation_level=None,  # autocommit, transactions are explicit
+        check_same_thread=False,  # the pool hands connections across threads
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections shared between threads.
+
+    A thread checks a connection out for the duration of a ``connection()``
+    or ``transaction()`` block; nested blocks on the same thread reuse it.
+    Connections go back to the pool instead of being closed, so after warm-up
+    a call costs no connection setup at all.
+    """
+
+    def __init__(self, path=DB_PATH, max_idle=8):
+        self.path = path
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @property
+    def created(self):
+        return self._created
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        conn = connect(self.path)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._acquire()
+        self._local.conn = conn
+        # Count the statements run for a profiled rerun
+        profiler = profiling.active()
+        if profiler is not None:
+            conn.set_trace_callback(profiler.on_statement)
+        try:
+            yield conn
+        finally:
+            if profiler is not None:
+                conn.set_trace_callback(None)
+            self._local.conn = None
+            self._release(conn)
+
+    def in_transaction(self):
+        """Whether this thread holds a pool connection with an open transaction."""
+        conn = getattr(self._local, 'conn', None)
+        return conn is not None and conn.in_transaction
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the block in one write transaction, nesting into an open one."""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            # IMMEDIATE takes the write lock up front so two writers never
+            # deadlock trying to upgrade a read lock.
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def set_pool(pool):
+    """Use ``pool`` for all helpers, e.g. one cached by the UI process."""
+    global _pool
+    with _pool_lock:
+        _pool = pool
+    return pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+def transaction():
+    return get_pool().transaction()
@@ -0,0 +1,131 @@
+import csv
+import io
+import json
+import os
+
+from .db import connection
+from .profiling import traced
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Rows fetched from SQLite per round trip, and so the most held in memory
+BATCH_SIZE = 5000
+
+EXPORT_COLUMNS = ('id', 'name', 'done', 'priority', 'deadline', 'note', 'category', 'start_date')
+# The first seven match the original CSV layout, so older spreadsheets still line up
+CSV_HEADER = ("ID", "Task Name", "Done", "Priority", "Deadline", "Note", "Category", "Start Date")
+EXPORT_SQL = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM tasks ORDER BY id"
+EXPORT_ARCHIVE_SQL = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM tasks_archive ORDER BY id"
+
+
+def iter_batches(batch_size=BATCH_SIZE, include_archive=False):
+    """Yield the tasks table as lists of at most ``batch_size`` row tuples.
+
+    With ``include_archive`` the archived tasks follow the active ones.
+    """
+    queries = (EXPORT_SQL, EXPORT_ARCHIVE_SQL) if include_archive else (EXPORT_SQL,)
+    with connection() as conn:
+        for sql in queries:
+            cursor = conn.execute(sql)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+def write_csv(f, batches):
+    text = io.TextIOWrapper(f, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text)
+    writer.writerow(CSV_HEADER)
+    for rows in batches:
+        writer.writerows(rows)
+    text.detach()
+
+
+def write_jsonl(f, batches):
+    for rows in batches:
+        lines = []
+        for row in rows:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record['done'] = bool(record['done'])
+            lines.append(json.dumps(record, ensure_ascii=False))
+        f.write(('\n'.join(lines) + '\n').encode('utf-8'))
+
+
+def write_parquet(f, batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs the pyarrow package (pip install pyarrow)")
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('name', pa.string()),
+        ('done', pa.bool_()),
+        ('priority', pa.string()),
+        ('deadline', pa.string()),
+        ('note', pa.string()),
+        ('category', pa.string()),
+        ('start_date', pa.string()),
+    ])
+    # One row group per batch keeps memory bounded by the batch size
+    with pq.ParquetWriter(f, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            columns[2] = [bool(v) for v in columns[2]]
+            writer.write_batch(pa.record_batch([list(c) for c in columns], schema=schema))
+
+
+WRITERS = {
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+    'parquet': write_parquet,
+}
+
+
+def default_export_path(fmt='csv'):
+    """``TODO_EXPORT_DIR``, else the Desktop when there is one, else home."""
+    directory = os.environ.get('TODO_EXPORT_DIR')
+    if not directory:
+        home = os.path.expanduser("~")
+        desktop = os.path.join(home, "Desktop")
+        directory = desktop if os.path.isdir(desktop) else home
+    return os.path.join(directory, f"todo_export.{fmt}")
+
+
+@traced
+def export_tasks(destination=None, fmt='csv', batch_size=BATCH_SIZE, include_archive=False):
+    """Stream every task to ``destination`` in ``fmt``.
+
+    ``destination`` may be a path or a binary file object. Without one the
+    export is written to an in-memory stream (positioned at the start) that
+    is returned, e.g. for ``st.download_button``; otherwise the destination
+    is returned. Archived tasks are only exported with ``include_archive``.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    write = WRITERS[fmt]
+    batches = iter_batches(batch_size, include_archive)
+    if destination is None:
+        stream = io.BytesIO()
+        write(stream, batches)
+        stream.seek(0)
+        return stream
+    if isinstance(destination, (str, os.PathLike)):
+        with open(destination, 'wb') as f:
+            write(f, batches)
+        return destination
+    write(destination, batches)
+    return destination
+
+
+def export_to_csv(file_path=None):
+    """Write a CSV export to ``file_path`` (default_export_path() if omitted)."""
+    return export_tasks(file_path or default_export_path('csv'), 'csv')
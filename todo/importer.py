@@ -0,0 +1,211 @@
+import argparse
+import csv
+import dataclasses
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+from .db import DB_PATH, ConnectionPool, set_pool, transaction
+from .export import CSV_HEADER, EXPORT_COLUMNS
+from .migrations import init_db
+from .profiling import traced
+from .queries import PRIORITIES, to_iso
+from .tasks import INSERT_TASK_SQL
+from .writer import get_writer
+
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 1000
+DEFAULT_CATEGORY = "General"
+
+# Accept both our own export headers and plain column names, any case
+FIELD_ALIASES = {label.lower(): column for label, column in zip(CSV_HEADER, EXPORT_COLUMNS)}
+FIELD_ALIASES.update({column: column for column in EXPORT_COLUMNS})
+FIELD_ALIASES.update({'title': 'name', 'task': 'name', 'due': 'deadline', 'due_date': 'deadline', 'start': 'start_date'})
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x', 'done'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+@dataclasses.dataclass
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    rejected: list = dataclasses.field(default_factory=list)  # (line number, reason)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (
+            f"Imported {self.imported} of {self.rows} rows in {self.seconds:.2f}s "
+            f"({self.rows_per_second:,.0f} rows/s), {len(self.rejected)} rejected"
+        )
+
+
+def _read_csv(f):
+    reader = csv.DictReader(f)
+    # Line numbers count the header line, like a spreadsheet would
+    for line, record in enumerate(reader, start=2):
+        yield line, record
+
+
+def _read_jsonl(f):
+    for line, text in enumerate(f, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except json.JSONDecodeError as e:
+            yield line, ValueError(f"invalid JSON: {e.msg}")
+            continue
+        if not isinstance(record, dict):
+            yield line, ValueError("expected a JSON object")
+            continue
+        yield line, record
+
+
+READERS = {
+    'csv': _read_csv,
+    'jsonl': _read_jsonl,
+}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _parse_done(value):
+    if isinstance(value, bool):
+        return value
+    text = _text(value).lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"invalid done value {value!r}")
+
+
+def _parse_priority(value):
+    text = _text(value)
+    if not text:
+        return "Medium"
+    for priority in PRIORITIES:
+        if text.lower() == priority.lower():
+            return priority
+    raise ValueError(f"unknown priority {value!r}")
+
+
+def _parse_date(value, field):
+    try:
+        return to_iso(_text(value))
+    except ValueError:
+        raise ValueError(f"invalid {field} {value!r}, expected YYYY-MM-DD")
+
+
+def normalize(record):
+    """Map one input record to INSERT_TASK_SQL parameters.
+
+    Raises ValueError describing the problem for rows that can't be imported.
+    """
+    fields = {}
+    for key, value in record.items():
+        column = FIELD_ALIASES.get(_text(key).lower())
+        if column:
+            fields[column] = value
+    name = _text(fields.get('name'))
+    if not name:
+        raise ValueError("missing task name")
+    return (
+        name,
+        _parse_done(fields.get('done')),
+        _parse_priority(fields.get('priority')),
+        _parse_date(fields.get('deadline'), 'deadline'),
+        _text(fields.get('note')) or None,
+        _text(fields.get('category')) or DEFAULT_CATEGORY,
+        _parse_date(fields.get('start_date'), 'start date'),
+    )
+
+
+def guess_format(name):
+    extension = os.path.splitext(name)[1].lower().lstrip('.')
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    return 'csv'
+
+
+@traced
+def import_tasks(source, fmt=None, batch_size=BATCH_SIZE):
+    """Import tasks from ``source`` (a path or a text/binary file object).
+
+    Rows are streamed, validated and inserted with executemany in batches of
+    ``batch_size``, all inside one transaction: either every valid row is
+    imported or, on a database error, none are. The import is one operation
+    on the writer thread, so other writes wait for it instead of contending
+    for the lock. Invalid rows are skipped and listed in the returned
+    ImportReport.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            return import_tasks(f, fmt or guess_format(os.fspath(source)), batch_size)
+    fmt = fmt or guess_format(getattr(source, 'name', ''))
+    if fmt not in READERS:
+        raise ValueError(f"Unknown import format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if isinstance(source, io.BufferedIOBase) or 'b' in getattr(source, 'mode', ''):
+        source = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+
+    report = ImportReport()
+    started = time.perf_counter()
+
+    def valid_rows():
+        for line, record in READERS[fmt](source):
+            report.rows += 1
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                yield normalize(record)
+            except ValueError as e:
+                report.rejected.append((line, str(e)))
+
+    def insert(rows):
+        with transaction() as conn:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                conn.executemany(INSERT_TASK_SQL, batch)
+                report.imported += len(batch)
+
+    get_writer().call(insert, valid_rows())
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import tasks from CSV or JSON Lines")
+    parser.add_argument('file', help="file to import, '-' for stdin")
+    parser.add_argument('--format', choices=FORMATS, help="input format (default: from the file extension)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--db', default=DB_PATH, help="database file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    set_pool(ConnectionPool(args.db))
+    init_db()
+    if args.file == '-':
+        report = import_tasks(sys.stdin, args.format or 'csv', args.batch_size)
+    else:
+        report = import_tasks(args.file, args.format, args.batch_size)
+    print(report.summary())
+    for line, reason in report.rejected:
+        print(f"  line {line}: {reason}", file=sys.stderr)
+    return 1 if report.rejected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
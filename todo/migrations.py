@@ -0,0 +1,499 @@
+import os
+import sqlite3
+import threading
+
+from .db import get_pool
+from .queries import NOW_SQL, ORDER_BY_SQL
+
+# Schema history. Each step upgrades the schema by one version and must be
+# idempotent, because databases created before versioning was introduced are
+# at user_version 0 with some of the later columns already present.
+
+
+def _create_tasks(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            done BOOLEAN NOT NULL CHECK (done IN (0, 1)),
+            priority TEXT DEFAULT 'Medium'
+        )
+    ''')
+
+
+def _add_columns(conn, table, columns):
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for name, definition in columns:
+        if name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+
+
+def _add_task_details(conn):
+    _add_columns(conn, 'tasks', (
+        ('priority', "TEXT DEFAULT 'Medium'"),
+        ('deadline', 'TEXT'),
+        ('note', 'TEXT'),
+        ('category', "TEXT DEFAULT 'General'"),
+        ('start_date', 'TEXT'),
+    ))
+
+
+def _index_task_order(conn):
+    # Dates are compared as text, so rewrite anything that isn't a plain
+    # 'YYYY-MM-DD' string (values date() can't parse become NULL)
+    for column in ('deadline', 'start_date'):
+        conn.execute(f'UPDATE tasks SET {column} = date({column}) WHERE {column} IS NOT date({column})')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_done_priority_deadline ON tasks (done, priority, deadline)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_category ON tasks (category)')
+
+
+# Full text index over name and note. The trigram tokenizer matches any
+# substring of three or more characters, which keeps the old "keyword in name"
+# behaviour and also works for text without spaces such as Japanese. The FTS
+# table stores no copy of the text (content='tasks'); triggers keep its index
+# in step with the tasks table. The trigram tokenizer needs SQLite 3.34, which
+# some Python builds predate (e.g. Ubuntu 20.04 ships 3.31).
+MIN_SQLITE_VERSION = (3, 34, 0)
+TASKS_FTS_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, name, note) VALUES (new.id, new.name, new.note);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, name, note) VALUES ('delete', old.id, old.name, old.note);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF name, note ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, name, note) VALUES ('delete', old.id, old.name, old.note);
+        INSERT INTO tasks_fts (rowid, name, note) VALUES (new.id, new.name, new.note);
+    END
+    ''',
+)
+
+
+def _create_search_index(conn):
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5 (
+            name, note,
+            content='tasks', content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+    for trigger in TASKS_FTS_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+def _index_display_order(conn):
+    # Same expressions as the list ORDER BY, so a page of the list is a range
+    # scan of this index instead of a sort of every matching row
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_tasks_display_order ON tasks ({ORDER_BY_SQL})')
+
+
+def _create_revision(conn):
+    # A counter bumped by every change to tasks, so readers can tell whether
+    # anything they cached is stale with one single-row read
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            value INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO revision (id, value) VALUES (1, 0)')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tasks_revision_{event.lower()} AFTER {event} ON tasks BEGIN
+                UPDATE revision SET value = value + 1 WHERE id = 1;
+            END
+        ''')
+
+
+def _validate_dates(conn):
+    # Date filters and sorting compare the text, so only accept real
+    # 'YYYY-MM-DD' dates from now on
+    for event in ('INSERT', 'UPDATE'):
+        for column in ('deadline', 'start_date'):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS tasks_check_{column}_{event.lower()} BEFORE {event} ON tasks
+                WHEN new.{column} IS NOT NULL AND new.{column} IS NOT date(new.{column})
+                BEGIN
+                    SELECT RAISE(ABORT, '{column} must be a YYYY-MM-DD date');
+                END
+            ''')
+    # Deadline range filters (Today, This Week, Overdue) on their own
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks (deadline)')
+
+
+# Stats keys use an empty blob for NULL so they can be part of the primary
+# key. Unlike '' it never equals a name, so tasks without a category and
+# tasks in the '' category are counted apart.
+STATS_KEY_SQL = "{row}.done, COALESCE({row}.priority, X''), COALESCE({row}.category, X'')"
+STATS_MATCH_SQL = (
+    "done = {row}.done AND priority = COALESCE({row}.priority, X'') AND category = COALESCE({row}.category, X'')"
+)
+STATS_ADD_SQL = f'''
+    INSERT INTO task_stats (done, priority, category, tasks) VALUES ({STATS_KEY_SQL.format(row='new')}, 1)
+    ON CONFLICT (done, priority, category) DO UPDATE SET tasks = tasks + 1;
+'''
+STATS_REMOVE_SQL = f'''
+    UPDATE task_stats SET tasks = tasks - 1 WHERE {STATS_MATCH_SQL.format(row='old')};
+    DELETE FROM task_stats WHERE tasks = 0 AND {STATS_MATCH_SQL.format(row='old')};
+'''
+# Open tasks per deadline day; tasks done or without a deadline aren't kept
+DEADLINES_ADD_SQL = '''
+    INSERT INTO task_deadlines (deadline, tasks) SELECT new.deadline, 1 WHERE new.done = 0 AND new.deadline IS NOT NULL
+    ON CONFLICT (deadline) DO UPDATE SET tasks = tasks + 1;
+'''
+DEADLINES_REMOVE_SQL = '''
+    UPDATE task_deadlines SET tasks = tasks - 1 WHERE old.done = 0 AND deadline = old.deadline;
+    DELETE FROM task_deadlines WHERE tasks = 0 AND deadline = old.deadline;
+'''
+TASK_STATS_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS task_stats_insert AFTER INSERT ON tasks BEGIN
+        {STATS_ADD_SQL}
+        {DEADLINES_ADD_SQL}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS task_stats_delete AFTER DELETE ON tasks BEGIN
+        {STATS_REMOVE_SQL}
+        {DEADLINES_REMOVE_SQL}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS task_stats_update AFTER UPDATE OF done, priority, category ON tasks BEGIN
+        {STATS_REMOVE_SQL}
+        {STATS_ADD_SQL}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS task_deadlines_update AFTER UPDATE OF done, deadline ON tasks BEGIN
+        {DEADLINES_REMOVE_SQL}
+        {DEADLINES_ADD_SQL}
+    END
+    ''',
+)
+
+
+def _create_task_stats(conn):
+    # Task counts per (done, priority, category), kept current by triggers.
+    # Every count the UI shows without a text search or a deadline filter
+    # is a sum over this table, whose size doesn't grow with the tasks.
+    # Dated figures come from task_deadlines, one row per day with open
+    # tasks due, and the open deadline index.
+    for trigger in ('task_stats_insert', 'task_stats_delete', 'task_stats_update', 'task_deadlines_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS task_stats')
+    conn.execute('''
+        CREATE TABLE task_stats (
+            done INTEGER NOT NULL,
+            priority TEXT NOT NULL,
+            category TEXT NOT NULL,
+            tasks INTEGER NOT NULL,
+            PRIMARY KEY (done, priority, category)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(f'''
+        INSERT INTO task_stats (done, priority, category, tasks)
+        SELECT {STATS_KEY_SQL.format(row='tasks')}, COUNT(*) FROM tasks GROUP BY 1, 2, 3
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_deadlines (
+            deadline TEXT PRIMARY KEY,
+            tasks INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('DELETE FROM task_deadlines')
+    conn.execute('''
+        INSERT INTO task_deadlines (deadline, tasks)
+        SELECT deadline, COUNT(*) FROM tasks WHERE done = 0 AND deadline IS NOT NULL GROUP BY deadline
+    ''')
+    # Overdue tasks per category and the burndown of one category
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_open_deadline ON tasks (category, deadline)
+        WHERE done = 0 AND deadline IS NOT NULL
+    ''')
+    for trigger in TASK_STATS_TRIGGERS:
+        conn.execute(trigger)
+
+
+# Every change to tasks bumps the revision and is logged under the new
+# revision number, in one trigger so the two can't get out of step
+TASK_CHANGES_TRIGGERS = tuple(
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_changes_{event.lower()} AFTER {event} ON tasks BEGIN
+        UPDATE revision SET value = value + 1 WHERE id = 1;
+        INSERT INTO task_changes (revision, task_id, op, task_version)
+        VALUES ((SELECT value FROM revision WHERE id = 1), {row}.id, '{event.lower()}', {row}.version);
+    END
+    '''
+    for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old'))
+)
+
+
+def _track_changes(conn):
+    # A per-row version for compare-and-swap updates, and an append-only log
+    # of changes by revision so clients can fetch what changed since the
+    # revision they last saw instead of reloading everything
+    _add_columns(conn, 'tasks', (
+        ('version', 'INTEGER NOT NULL DEFAULT 1'),
+        ('updated_at', 'TEXT'),
+    ))
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            revision INTEGER PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete')),
+            task_version INTEGER
+        )
+    ''')
+    # Replaced by the logging triggers; dropped before the backfill so it
+    # doesn't bump the revision once per row
+    for event in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS tasks_revision_{event}')
+    conn.execute(f'UPDATE tasks SET updated_at = {NOW_SQL} WHERE updated_at IS NULL')
+    for trigger in TASK_CHANGES_TRIGGERS:
+        conn.execute(trigger)
+    # Rows read before now have no version, so every cache must reload
+    conn.execute('UPDATE revision SET value = value + 1 WHERE id = 1')
+
+
+# Tasks per category, kept by triggers like task_stats. A category row exists
+# exactly while tasks use it; the last task leaving removes it.
+CATEGORY_ADD_SQL = '''
+    INSERT INTO categories (name, tasks) SELECT new.category, 1 WHERE new.category IS NOT NULL
+    ON CONFLICT (name) DO UPDATE SET tasks = tasks + 1;
+'''
+CATEGORY_REMOVE_SQL = '''
+    UPDATE categories SET tasks = tasks - 1 WHERE name = old.category;
+    DELETE FROM categories WHERE name = old.category AND tasks = 0;
+'''
+TASK_CATEGORY_TRIGGERS = (
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_categories_insert AFTER INSERT ON tasks BEGIN
+        {CATEGORY_ADD_SQL}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_categories_delete AFTER DELETE ON tasks BEGIN
+        {CATEGORY_REMOVE_SQL}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_categories_update AFTER UPDATE OF category ON tasks
+    WHEN old.category IS NOT new.category
+    BEGIN
+        {CATEGORY_ADD_SQL}
+        {CATEGORY_REMOVE_SQL}
+    END
+    ''',
+)
+
+TASKS_COLUMNS = 'id, name, done, priority, deadline, note, category, start_date, version, updated_at'
+
+
+def _create_categories(conn):
+    # Categories get their own table, so the category list is a read of a
+    # few rows instead of a scan of tasks, and tasks.category becomes a
+    # foreign key to it
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            name TEXT PRIMARY KEY,
+            tasks INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('DELETE FROM categories')
+    conn.execute('''
+        INSERT INTO categories (name, tasks)
+        SELECT category, COUNT(*) FROM tasks WHERE category IS NOT NULL GROUP BY category
+    ''')
+    # SQLite can't add a constraint to an existing column, so tasks is
+    # rebuilt. Ids are copied, which keeps the search index (keyed by rowid)
+    # and the change log valid; the AUTOINCREMENT counter is carried over so
+    # ids of deleted tasks are still never reused.
+    conn.execute('''
+        CREATE TABLE tasks_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            done BOOLEAN NOT NULL CHECK (done IN (0, 1)),
+            priority TEXT DEFAULT 'Medium',
+            deadline TEXT,
+            note TEXT,
+            category TEXT DEFAULT 'General' REFERENCES categories (name),
+            start_date TEXT,
+            version INTEGER NOT NULL DEFAULT 1,
+            updated_at TEXT
+        )
+    ''')
+    conn.execute(f'INSERT INTO tasks_new ({TASKS_COLUMNS}) SELECT {TASKS_COLUMNS} FROM tasks')
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'").fetchone()
+    # Dropping the table drops its indexes and triggers too
+    conn.execute('DROP TABLE tasks')
+    conn.execute('ALTER TABLE tasks_new RENAME TO tasks')
+    if row is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'tasks'", row)
+    _index_task_order(conn)
+    _index_display_order(conn)
+    _validate_dates(conn)
+    for trigger in TASKS_FTS_TRIGGERS + TASK_STATS_TRIGGERS + TASK_CHANGES_TRIGGERS + TASK_CATEGORY_TRIGGERS:
+        conn.execute(trigger)
+
+
+def _add_recurrence(conn):
+    # A recurring task keeps its rule and the last date its occurrences were
+    # created up to; occurrences are ordinary tasks pointing back at it
+    _add_columns(conn, 'tasks', (
+        ('recurrence', 'TEXT'),
+        ('recurrence_through', 'TEXT'),
+        ('series_id', 'INTEGER REFERENCES tasks (id) ON DELETE SET NULL'),
+    ))
+    # Finding the rules that are due is a read of this small partial index
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_recurrence ON tasks (recurrence_through) WHERE recurrence IS NOT NULL')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_series ON tasks (series_id) WHERE series_id IS NOT NULL')
+
+
+# Columns of tasks_archive besides archived_at, all copied from tasks
+ARCHIVE_COLUMNS = f'{TASKS_COLUMNS}, recurrence, series_id, completed_at'
+
+
+def _create_archive(conn):
+    # When each task was completed, so tasks done long ago can be moved to
+    # tasks_archive. Tasks already done count from their last change.
+    _add_columns(conn, 'tasks', (('completed_at', 'TEXT'),))
+    # Not a change clients need to see; without the logging trigger the
+    # backfill doesn't log and bump the revision once per row
+    conn.execute('DROP TRIGGER IF EXISTS tasks_changes_update')
+    conn.execute('UPDATE tasks SET completed_at = updated_at WHERE done = 1 AND completed_at IS NULL')
+    for trigger in TASK_CHANGES_TRIGGERS:
+        conn.execute(trigger)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed_at) WHERE done = 1')
+    # Same columns, but no foreign keys, search index or triggers: archived
+    # tasks are only read on demand
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            done BOOLEAN NOT NULL,
+            priority TEXT,
+            deadline TEXT,
+            note TEXT,
+            category TEXT,
+            start_date TEXT,
+            version INTEGER NOT NULL,
+            updated_at TEXT,
+            recurrence TEXT,
+            series_id INTEGER,
+            completed_at TEXT,
+            archived_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_tasks_archive_display_order ON tasks_archive ({ORDER_BY_SQL})')
+
+
+def _split_task_stats(conn):
+    # task_stats used to be keyed by deadline too, which made it grow with
+    # the number of distinct dates; rebuilt in the current layout
+    _create_task_stats(conn)
+
+
+def _record_log_start(conn):
+    # The change log covers every change after revision.logged_from. Kept
+    # explicitly, since an empty log can mean nothing changed yet (a new
+    # database) as well as everything was pruned. A database that never had
+    # tasks logs from 0; otherwise from the revision before the oldest entry.
+    _add_columns(conn, 'revision', (('logged_from', 'INTEGER NOT NULL DEFAULT 0'),))
+    conn.execute('''
+        UPDATE revision SET logged_from = CASE
+            WHEN value <= 1 AND NOT EXISTS (SELECT 1 FROM tasks) AND NOT EXISTS (SELECT 1 FROM task_changes) THEN 0
+            ELSE COALESCE((SELECT MIN(revision) - 1 FROM task_changes), value)
+        END
+        WHERE id = 1
+    ''')
+
+
+def _separate_null_stats(conn):
+    # task_stats keyed NULL like '', merging tasks without a category into
+    # the '' category; rebuilt with the empty blob key
+    _create_task_stats(conn)
+
+
+MIGRATIONS = (
+    _create_tasks,
+    _add_task_details,
+    _index_task_order,
+    _create_search_index,
+    _index_display_order,
+    _create_revision,
+    _validate_dates,
+    _create_task_stats,
+    _track_changes,
+    _create_categories,
+    _add_recurrence,
+    _create_archive,
+    _split_task_stats,
+    _record_log_start,
+    _separate_null_stats,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Bring the database on ``conn`` up to SCHEMA_VERSION.
+
+    Returns the list of applied step names. Only reads ``user_version`` when
+    the schema is current, so it takes no write lock in that case.
+    """
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return []
+    applied = []
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Re-read under the write lock, another process may have migrated
+        version = schema_version(conn)
+        for step in MIGRATIONS[version:]:
+            step(conn)
+            applied.append(step.__name__)
+        # PRAGMA does not accept parameters; SCHEMA_VERSION is an int we own
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+    return applied
+
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def init_db():
+    """Migrate the pool's database once per process.
+
+    Streamlit calls this on every rerun, after the first call for a database
+    file it is a set lookup.
+    """
+    pool = get_pool()
+    key = os.path.abspath(pool.path)
+    if key in _migrated:
+        return
+    # Checked up front: with an older SQLite every write to tasks fails
+    # with "no such tokenizer", even on a database created elsewhere
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"The task database needs SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} or newer for its "
+            f"search index, but this Python uses SQLite {sqlite3.sqlite_version}"
+        )
+    with _migrate_lock:
+        if key in _migrated:
+            return
+        with pool.connection() as conn:
+            migrate(conn)
+        _migrated.add(key)
@@ -0,0 +1,180 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import io
+import json
+import os
+import time
+
+# Opt in with TODO_PROFILE=1 (timing spans and query counts) or
+# TODO_PROFILE=cprofile (also a cProfile of the whole run). With
+# TODO_PROFILE_LOG set, every report is appended there as one JSON line.
+PROFILE_ENV = 'TODO_PROFILE'
+PROFILE_LOG_ENV = 'TODO_PROFILE_LOG'
+
+# The profiler of the run in progress on this thread, None when not profiling.
+# Everything below checks it first, so the disabled cost is one lookup.
+_active = contextvars.ContextVar('todo_profiler', default=None)
+
+
+def profile_mode(value=None):
+    """'cprofile', 'spans' or None for ``value``, by default TODO_PROFILE."""
+    if value is None:
+        value = os.environ.get(PROFILE_ENV, '')
+    value = value.strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    return 'cprofile' if value == 'cprofile' else 'spans'
+
+
+def _result_rows(result):
+    # Rows handed back by a helper: a list of records, a (page, cursor) pair
+    # or a DataFrame
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    shape = getattr(result, 'shape', None)
+    return shape[0] if shape else 0
+
+
+class Profiler:
+    """Timing spans, SQL statement counts and rows fetched for one run.
+
+    Spans nest; each one records its own elapsed time plus the statements
+    and rows attributed to it, including those of spans inside it.
+    """
+
+    def __init__(self, name='run', cprofile=False):
+        self.name = name
+        self.spans = []  # (name, depth, start offset, seconds, statements, rows)
+        self.statements = 0
+        self.rows = 0
+        self.sql = collections.Counter()
+        self.seconds = 0.0
+        self._depth = 0
+        self._started = None
+        self._cprofile = None
+        if cprofile:
+            # Loaded only when asked for, pstats alone costs more to import
+            # than the rest of the package
+            import cProfile
+            self._cprofile = cProfile.Profile()
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+        self.seconds = time.perf_counter() - self._started
+
+    @contextlib.contextmanager
+    def span(self, name):
+        index = len(self.spans)
+        self.spans.append(None)
+        statements, rows = self.statements, self.rows
+        started = time.perf_counter()
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            self.spans[index] = (
+                name, self._depth, started - self._started, time.perf_counter() - started,
+                self.statements - statements, self.rows - rows,
+            )
+
+    def on_statement(self, sql):
+        # sqlite3 trace callback. Statements run by triggers are reported
+        # as "-- TRIGGER name" and belong to the statement that fired them.
+        if sql.startswith('--'):
+            return
+        self.statements += 1
+        self.sql[' '.join(sql.split())[:120]] += 1
+
+    def add_rows(self, count):
+        self.rows += count
+
+    def top_functions(self, limit=20, sort='cumulative'):
+        """The cProfile table as text, or '' if cProfile was not enabled."""
+        if not self._cprofile:
+            return ''
+        import pstats
+
+        out = io.StringIO()
+        pstats.Stats(self._cprofile, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def report(self, top_statements=10):
+        return {
+            'name': self.name,
+            'ms': round(self.seconds * 1000, 3),
+            'statements': self.statements,
+            'rows': self.rows,
+            'spans': [
+                {
+                    'name': name, 'depth': depth, 'start_ms': round(start * 1000, 3),
+                    'ms': round(seconds * 1000, 3), 'statements': statements, 'rows': rows,
+                }
+                for name, depth, start, seconds, statements, rows in self.spans
+            ],
+            'top_statements': self.sql.most_common(top_statements),
+        }
+
+
+def active():
+    return _active.get()
+
+
+@contextlib.contextmanager
+def profile(name='run', cprofile=False, log_path=None):
+    """Profile the block. Yields the Profiler, which is complete afterwards."""
+    profiler = Profiler(name, cprofile)
+    token = _active.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active.reset(token)
+        log_path = log_path or os.environ.get(PROFILE_LOG_ENV)
+        if log_path:
+            log_report(profiler, log_path)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the block as ``name`` when profiling, otherwise do nothing."""
+    profiler = _active.get()
+    if profiler is None:
+        yield None
+        return
+    with profiler.span(name):
+        yield profiler
+
+
+def traced(func):
+    """Record each call of ``func`` as a span, with the rows it returned."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = _active.get()
+        if profiler is None:
+            return func(*args, **kwargs)
+        with profiler.span(name):
+            result = func(*args, **kwargs)
+            profiler.add_rows(_result_rows(result))
+            return result
+
+    return wrapper
+
+
+def log_report(profiler, path):
+    record = dict(profiler.report(), timestamp=time.time(), pid=os.getpid())
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
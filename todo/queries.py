@@ -0,0 +1,183 @@
+import dataclasses
+import datetime
+
+from .search import MATCH_SQL, like_pattern, match_expression, split_terms
+
+PRIORITIES = ("High", "Medium", "Low")
+
+# High first, unknown priorities last
+PRIORITY_RANK_SQL = "CASE priority WHEN 'High' THEN 0 WHEN 'Medium' THEN 1 WHEN 'Low' THEN 2 ELSE 3 END"
+
+# Open tasks whose deadline has passed, evaluated by SQLite on the local date
+OVERDUE_SQL = "done = 0 AND deadline < date('now', 'localtime')"
+
+# UTC time of a change, as stored in tasks.updated_at
+NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+TASK_COLUMNS = (
+    'id, name, done, priority, deadline, note, category, start_date, version, updated_at, '
+    f'recurrence, series_id, {OVERDUE_SQL} AS overdue'
+)
+# Paged queries add the sort key columns after these
+TASK_COLUMN_COUNT = 13
+
+# Open tasks first, then by priority, then earliest deadline (no deadline
+# last). The id makes the key unique so it can serve as a page cursor.
+ORDER_KEYS = ('done', PRIORITY_RANK_SQL, "COALESCE(deadline, '9999-99-99')", 'id')
+ORDER_BY_SQL = ', '.join(ORDER_KEYS)
+
+# Search results: open tasks first, then by relevance
+SEARCH_ORDER_KEYS = ('done', 'hits.score', 'id')
+
+DEADLINE_OPTIONS = ("All", "Today", "This Week", "Overdue")
+
+
+def to_iso(value):
+    """Normalize a date value to the sortable 'YYYY-MM-DD' form stored in the db."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return datetime.date.fromisoformat(str(value)[:10]).isoformat()
+
+
+@dataclasses.dataclass(frozen=True)
+class TaskFilter:
+    """Criteria for ``list_tasks``. Empty criteria don't filter."""
+
+    search: str = ''
+    priorities: tuple = ()
+    categories: tuple = ()
+    deadline_from: str = None
+    deadline_to: str = None
+    done: bool = None
+    # Read the archive (tasks_archive) instead of the active tasks
+    archived: bool = False
+
+
+def deadline_range(option, today=None):
+    """Map a sidebar deadline option to TaskFilter keyword arguments."""
+    today = today or datetime.date.today()
+    if option == "Today":
+        return {'deadline_from': today.isoformat(), 'deadline_to': today.isoformat()}
+    if option == "This Week":
+        start_of_week = today - datetime.timedelta(days=today.weekday())
+        end_of_week = start_of_week + datetime.timedelta(days=6)
+        return {'deadline_from': start_of_week.isoformat(), 'deadline_to': end_of_week.isoformat()}
+    if option == "Overdue":
+        yesterday = today - datetime.timedelta(days=1)
+        return {'deadline_to': yesterday.isoformat(), 'done': False}
+    return {}
+
+
+def _in_clause(column, values):
+    placeholders = ', '.join('?' * len(values))
+    return f'{column} IN ({placeholders})', list(values)
+
+
+def _conditions(task_filter, short_terms=()):
+    conditions = []
+    params = []
+    for term in short_terms:
+        pattern = like_pattern(term)
+        conditions.append("(name LIKE ? ESCAPE '\\' OR note LIKE ? ESCAPE '\\')")
+        params += [pattern, pattern]
+    if task_filter.priorities:
+        condition, values = _in_clause('priority', task_filter.priorities)
+        conditions.append(condition)
+        params += values
+    if task_filter.categories:
+        condition, values = _in_clause('category', task_filter.categories)
+        conditions.append(condition)
+        params += values
+    if task_filter.deadline_from:
+        conditions.append('deadline >= ?')
+        params.append(task_filter.deadline_from)
+    if task_filter.deadline_to:
+        conditions.append('deadline <= ?')
+        params.append(task_filter.deadline_to)
+    if task_filter.done is not None:
+        conditions.append('done = ?')
+        params.append(int(task_filter.done))
+    return conditions, params
+
+
+def _where(conditions):
+    if not conditions:
+        return ''
+    return ' WHERE ' + ' AND '.join(conditions)
+
+
+def _source(task_filter):
+    """FROM clause, sort keys, and the filter conditions for ``task_filter``."""
+    indexed_terms, short_terms = split_terms(task_filter.search)
+    if task_filter.archived:
+        # The archive has no search index; it's only read on demand, so
+        # every term is a LIKE scan
+        conditions, params = _conditions(task_filter, indexed_terms + short_terms)
+        return 'tasks_archive', ORDER_KEYS, conditions, params
+    conditions, params = _conditions(task_filter, short_terms)
+    expression = match_expression(indexed_terms)
+    if expression is None:
+        return 'tasks', ORDER_KEYS, conditions, params
+    # Let the FTS index find the candidate rows, then apply the other filters
+    source = f'tasks JOIN ({MATCH_SQL}) AS hits ON hits.task_id = tasks.id'
+    return source, SEARCH_ORDER_KEYS, conditions, [expression] + params
+
+
+def sort_key_length(task_filter):
+    """Number of values in a page cursor of ``task_filter``."""
+    return len(_source(task_filter)[1])
+
+
+def select_tasks(task_filter, after=None, limit=None):
+    """Build the filtered, sorted task query. Returns (sql, params).
+
+    With ``limit`` the query returns one page and every row carries its sort
+    key after the task columns. Passing the last key of a page as ``after``
+    continues from there without re-reading the earlier rows.
+    """
+    source, keys, conditions, params = _source(task_filter)
+    order_by = ', '.join(keys)
+    columns = TASK_COLUMNS
+    if limit is not None:
+        columns = f'{columns}, {order_by}'
+    if after is not None:
+        conditions = conditions + [f"({order_by}) > ({', '.join('?' * len(keys))})"]
+        params = params + list(after)
+    sql = f'SELECT {columns} FROM {source}{_where(conditions)} ORDER BY {order_by}'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params = params + [limit]
+    return sql, params
+
+
+def count_tasks(task_filter):
+    """Query returning (total, done) counts for ``task_filter``.
+
+    Without a text search or a deadline range every criterion is a column
+    of the trigger maintained task_stats table, so the counts are summed
+    from there. Deadline ranges are counted on idx_tasks_deadline.
+    """
+    if not (task_filter.search.split() or task_filter.archived or task_filter.deadline_from or task_filter.deadline_to):
+        conditions, params = _conditions(task_filter)
+        sql = f'SELECT COALESCE(SUM(tasks), 0), COALESCE(SUM(CASE WHEN done THEN tasks END), 0) FROM task_stats{_where(conditions)}'
+        return sql, params
+    source, _, conditions, params = _source(task_filter)
+    return f'SELECT COUNT(*), COALESCE(SUM(done), 0) FROM {source}{_where(conditions)}', params
+
+
+# Column names are the Gantt chart's labels
+GANTT_COLUMNS = (
+    "name AS Task, start_date AS Start, deadline AS Finish, priority AS Priority, "
+    "category AS Category, CASE WHEN done THEN 'Done' ELSE 'Pending' END AS Done"
+)
+
+
+def select_gantt(task_filter):
+    """Query for the Gantt chart: tasks with both dates, earliest start first."""
+    source, _, conditions, params = _source(task_filter)
+    conditions = conditions + ['start_date IS NOT NULL', 'deadline IS NOT NULL']
+    return f'SELECT {GANTT_COLUMNS} FROM {source}{_where(conditions)} ORDER BY start_date, id', params
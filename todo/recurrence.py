@@ -0,0 +1,185 @@
+"""Recurrence rules: a subset of iCalendar RRULE.
+
+    daily | weekly | monthly | yearly
+    FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=2025-06-30
+    FREQ=MONTHLY;BYMONTHDAY=1,15,-1;COUNT=12
+
+Supported parts are FREQ, INTERVAL, BYDAY (plain weekdays, for weekly rules),
+BYMONTHDAY (monthly rules, negative days count from the month end), COUNT and
+UNTIL. Dates only; the rule repeats the task's deadline (or start date).
+"""
+import calendar
+import datetime
+import itertools
+from typing import NamedTuple
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+# Short forms offered by the UI and the CLI
+SHORTHANDS = {'daily': 'FREQ=DAILY', 'weekly': 'FREQ=WEEKLY', 'monthly': 'FREQ=MONTHLY', 'yearly': 'FREQ=YEARLY'}
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int = 1
+    byday: tuple = ()
+    bymonthday: tuple = ()
+    count: int = None
+    until: datetime.date = None
+
+    def __str__(self):
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.byday:
+            parts.append('BYDAY=' + ','.join(WEEKDAYS[day] for day in self.byday))
+        if self.bymonthday:
+            parts.append('BYMONTHDAY=' + ','.join(str(day) for day in self.bymonthday))
+        if self.count is not None:
+            parts.append(f'COUNT={self.count}')
+        if self.until is not None:
+            parts.append(f'UNTIL={self.until.isoformat()}')
+        return ';'.join(parts)
+
+
+def _positive_int(name, value):
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(f"{name} must be a positive number, got {value!r}")
+    return int(value)
+
+
+def _until(value):
+    try:
+        if len(value) >= 8 and value[:8].isdigit():
+            # RRULE form, 20250630 or 20250630T000000Z
+            return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"UNTIL must be a date, got {value!r}")
+
+
+def parse_rule(text):
+    """Parse a rule or one of SHORTHANDS into a Rule; ValueError if invalid."""
+    text = SHORTHANDS.get(text.strip().lower(), text).strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[len('RRULE:'):]
+    parts = {}
+    for part in filter(None, text.split(';')):
+        name, sep, value = part.partition('=')
+        if not sep or not value:
+            raise ValueError(f"invalid rule part {part!r}, expected NAME=VALUE")
+        parts[name.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    interval = _positive_int('INTERVAL', parts.pop('INTERVAL', '1'))
+    byday = ()
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise ValueError("BYDAY is only supported for weekly rules")
+        days = parts.pop('BYDAY').split(',')
+        if not set(days) <= set(WEEKDAYS):
+            raise ValueError(f"BYDAY takes weekdays {','.join(WEEKDAYS)}")
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+    bymonthday = ()
+    if 'BYMONTHDAY' in parts:
+        if freq != 'MONTHLY':
+            raise ValueError("BYMONTHDAY is only supported for monthly rules")
+        try:
+            bymonthday = tuple(sorted({int(day) for day in parts.pop('BYMONTHDAY').split(',')}))
+        except ValueError:
+            raise ValueError("BYMONTHDAY takes day numbers")
+        if not all(1 <= abs(day) <= 31 for day in bymonthday):
+            raise ValueError("BYMONTHDAY days must be between 1 and 31, or -31 and -1")
+    count = _positive_int('COUNT', parts.pop('COUNT')) if 'COUNT' in parts else None
+    until = _until(parts.pop('UNTIL')) if 'UNTIL' in parts else None
+    if count is not None and until is not None:
+        raise ValueError("a rule can't have both COUNT and UNTIL")
+    if parts:
+        raise ValueError(f"unsupported rule parts: {', '.join(sorted(parts))}")
+    return Rule(freq, interval, byday, bymonthday, count, until)
+
+
+def normalize_rule(text):
+    """The canonical form of a rule as stored in tasks.recurrence, or None."""
+    if text is None or not text.strip() or text.strip().lower() == 'none':
+        return None
+    return str(parse_rule(text))
+
+
+def _add_months(year, month, months):
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def _days(rule, dtstart):
+    # Candidate dates in order, from the period containing dtstart on
+    if rule.freq == 'DAILY':
+        for step in itertools.count():
+            yield dtstart + datetime.timedelta(days=step * rule.interval)
+    elif rule.freq == 'WEEKLY':
+        week = dtstart - datetime.timedelta(days=dtstart.weekday())
+        byday = rule.byday or (dtstart.weekday(),)
+        for step in itertools.count():
+            start = week + datetime.timedelta(weeks=step * rule.interval)
+            for day in byday:
+                yield start + datetime.timedelta(days=day)
+    elif rule.freq == 'MONTHLY':
+        bymonthday = rule.bymonthday or (dtstart.day,)
+        misses = 0
+        for step in itertools.count():
+            year, month = _add_months(dtstart.year, dtstart.month, step * rule.interval)
+            length = calendar.monthrange(year, month)[1]
+            # Days the month doesn't have (the 31st in April) are skipped
+            days = sorted({day if day > 0 else length + day + 1 for day in bymonthday if abs(day) <= length})
+            # The months visited repeat within 12 steps, so a rule that
+            # matched none of them (the 30th of every February) never will
+            misses = 0 if days else misses + 1
+            if misses == 12:
+                return
+            for day in days:
+                yield datetime.date(year, month, day)
+    else:
+        misses = 0
+        for step in itertools.count():
+            year = dtstart.year + step * rule.interval
+            if (dtstart.month, dtstart.day) != (2, 29) or calendar.isleap(year):
+                misses = 0
+                yield dtstart.replace(year=year)
+            else:
+                # The leap year pattern repeats every 400 years, so after
+                # 400 misses February 29th never comes again
+                misses += 1
+                if misses == 400:
+                    return
+
+
+def occurrences(rule, dtstart):
+    """Dates of ``rule`` starting at ``dtstart``, lazily and in order.
+
+    ``dtstart`` itself is the first occurrence, as in RFC 5545, so COUNT
+    includes it. Without COUNT or UNTIL the generator never ends; slice it
+    with itertools.takewhile.
+    """
+    days = itertools.chain((dtstart,), (day for day in _days(rule, dtstart) if day > dtstart))
+    if rule.until is not None:
+        days = itertools.takewhile(lambda day: day <= rule.until, days)
+    if rule.count is not None:
+        days = itertools.islice(days, rule.count)
+    return days
+
+
+def ends_by(rule, dtstart, until):
+    """Whether ``rule`` has no occurrences after ``until``."""
+    if rule.until is not None:
+        return rule.until <= until
+    if rule.count is not None:
+        return sum(1 for _ in itertools.takewhile(lambda day: day <= until, occurrences(rule, dtstart))) >= rule.count
+    return False
+
+
+def between(rule, dtstart, after, until):
+    """Occurrences later than ``after`` and no later than ``until``."""
+    days = itertools.dropwhile(lambda day: day <= after, occurrences(rule, dtstart))
+    return itertools.takewhile(lambda day: day <= until, days)
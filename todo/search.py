@@ -0,0 +1,35 @@
+# bm25 column weights: a hit in the name counts ten times a hit in the note
+BM25_SQL = 'bm25(tasks_fts, 10.0, 1.0)'
+
+# Ranked matches, used as a subquery joined to tasks
+MATCH_SQL = f'SELECT rowid AS task_id, {BM25_SQL} AS score FROM tasks_fts WHERE tasks_fts MATCH ?'
+
+# Trigrams can't index terms shorter than three characters
+MIN_TERM_LENGTH = 3
+
+
+def split_terms(text):
+    """Split search text into (indexed, short) terms.
+
+    Indexed terms are answered by the FTS index, short ones need a LIKE scan.
+    """
+    terms = (text or '').split()
+    indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH]
+    short = [term for term in terms if len(term) < MIN_TERM_LENGTH]
+    return indexed, short
+
+
+def match_expression(terms):
+    """FTS5 query matching rows that contain every term as a substring.
+
+    Terms are quoted, so FTS5 operators typed by the user are taken literally.
+    Returns None when there is nothing to match.
+    """
+    if not terms:
+        return None
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
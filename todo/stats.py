@@ -0,0 +1,108 @@
+import datetime
+from typing import NamedTuple
+
+from .db import connection
+from .profiling import traced
+
+# Counts come from the trigger maintained task_stats table, whose size
+# depends on the number of (done, priority, category) combinations rather
+# than on the number of tasks. Dated figures read task_deadlines, one row
+# per day with open tasks due, or the open deadline index for one category.
+# NULL categories and priorities are keyed as X'' (see migrations.STATS_KEY_SQL).
+SUMMARY_SQL = '''
+    SELECT
+        COALESCE(SUM(tasks), 0),
+        COALESCE(SUM(CASE WHEN done THEN tasks END), 0),
+        (SELECT COALESCE(SUM(tasks), 0) FROM task_deadlines WHERE deadline < ?),
+        (SELECT COALESCE(SUM(tasks), 0) FROM task_deadlines WHERE deadline BETWEEN ? AND ?)
+    FROM task_stats
+'''
+# Overdue tasks of a category are a range of idx_tasks_open_deadline. The
+# planner is told so; without statistics it picks the display order index
+# and reads every open task.
+BY_CATEGORY_SQL = '''
+    SELECT NULLIF(category, X''), SUM(tasks), SUM(CASE WHEN done THEN tasks ELSE 0 END), (
+        SELECT COUNT(*) FROM tasks INDEXED BY idx_tasks_open_deadline
+        WHERE done = 0 AND tasks.category IS NULLIF(task_stats.category, X'') AND deadline < ?
+    )
+    FROM task_stats GROUP BY category ORDER BY category
+'''
+BY_PRIORITY_SQL = '''
+    SELECT NULLIF(priority, X''), SUM(tasks), SUM(CASE WHEN done THEN tasks ELSE 0 END)
+    FROM task_stats GROUP BY priority
+'''
+OPEN_BY_DEADLINE_SQL = 'SELECT deadline, tasks FROM task_deadlines ORDER BY deadline'
+CATEGORY_OPEN_BY_DEADLINE_SQL = '''
+    SELECT deadline, COUNT(*) FROM tasks INDEXED BY idx_tasks_open_deadline
+    WHERE done = 0 AND deadline IS NOT NULL AND category = ?
+    GROUP BY deadline ORDER BY deadline
+'''
+
+
+class Summary(NamedTuple):
+    total: int
+    done: int
+    overdue: int
+    due_this_week: int
+
+    @property
+    def completion(self):
+        return self.done / self.total if self.total else 0.0
+
+
+class GroupStats(NamedTuple):
+    name: str
+    total: int
+    done: int
+    overdue: int = 0
+
+    @property
+    def completion(self):
+        return self.done / self.total if self.total else 0.0
+
+
+def _week(today):
+    start_of_week = today - datetime.timedelta(days=today.weekday())
+    return start_of_week, start_of_week + datetime.timedelta(days=6)
+
+
+@traced
+def get_summary(today=None):
+    today = today or datetime.date.today()
+    start_of_week, end_of_week = _week(today)
+    with connection() as conn:
+        row = conn.execute(SUMMARY_SQL, (today.isoformat(), start_of_week.isoformat(), end_of_week.isoformat())).fetchone()
+    return Summary(*row)
+
+
+@traced
+def get_category_stats(today=None):
+    today = today or datetime.date.today()
+    with connection() as conn:
+        return [GroupStats(*row) for row in conn.execute(BY_CATEGORY_SQL, (today.isoformat(),))]
+
+
+@traced
+def get_priority_stats():
+    with connection() as conn:
+        return [GroupStats(*row) for row in conn.execute(BY_PRIORITY_SQL)]
+
+
+@traced
+def get_burndown(category=None):
+    """Open tasks still remaining after each deadline, for tasks with one.
+
+    Returns [(date, remaining)], assuming every task is finished by its
+    deadline; the first point is the total before the earliest deadline.
+    """
+    with connection() as conn:
+        if category is None:
+            rows = conn.execute(OPEN_BY_DEADLINE_SQL).fetchall()
+        else:
+            rows = conn.execute(CATEGORY_OPEN_BY_DEADLINE_SQL, (category,)).fetchall()
+    remaining = sum(count for _, count in rows)
+    burndown = []
+    for deadline, count in rows:
+        remaining -= count
+        burndown.append((datetime.date.fromisoformat(deadline), remaining))
+    return burndown
@@ -0,0 +1,451 @@
+import datetime
+import itertools
+from typing import NamedTuple
+
+from .db import connection, transaction
+from .profiling import traced
+from .queries import (
+    NOW_SQL,
+    PRIORITIES,
+    TASK_COLUMN_COUNT,
+    TASK_COLUMNS,
+    TaskFilter,
+    count_tasks,
+    select_tasks,
+    to_iso,
+)
+from .recurrence import between, ends_by, normalize_rule, parse_rule
+from .writer import serialized
+
+# Occurrences of recurring tasks are created this far ahead of today
+RECURRENCE_WINDOW = datetime.timedelta(days=90)
+# recurrence_through of a rule with no occurrences left, never due again
+END_OF_TIME = '9999-12-31'
+
+# Statements are module constants so every pooled connection compiles each of
+# them once and reuses the prepared statement afterwards.
+SELECT_TASKS_SQL = f'SELECT {TASK_COLUMNS} FROM tasks'
+SELECT_TASK_SQL = f'SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?'
+# Category names come from the categories table, a few rows kept by triggers
+SELECT_CATEGORIES_SQL = 'SELECT name FROM categories ORDER BY name'
+SELECT_CATEGORY_USAGE_SQL = 'SELECT name, tasks FROM categories ORDER BY name'
+INSERT_TASK_SQL = f'''
+    INSERT INTO tasks (name, done, priority, deadline, note, category, start_date, updated_at, completed_at)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, {NOW_SQL}, CASE WHEN ?2 THEN {NOW_SQL} END)
+'''
+# Every update bumps the row version. The single-task updates take the
+# version the caller last saw (or NULL to skip the check) and only apply if
+# the row is still at it.
+VERSION_SQL = f'version = version + 1, updated_at = {NOW_SQL}'
+# Status updates take ``done`` twice: for done and for completed_at, which
+# keeps the first completion time and is cleared when the task is reopened
+COMPLETED_SQL = f'completed_at = CASE WHEN ? THEN COALESCE(completed_at, {NOW_SQL}) END'
+UPDATE_TASK_SQL = f'''
+    UPDATE tasks
+    SET name = ?, priority = ?, deadline = ?, note = ?, category = ?, start_date = ?, {VERSION_SQL}
+    WHERE id = ? AND version = COALESCE(?, version)
+'''
+UPDATE_STATUS_SQL = f'UPDATE tasks SET done = ?, {COMPLETED_SQL}, {VERSION_SQL} WHERE id = ? AND version = COALESCE(?, version)'
+UPDATE_STATUSES_SQL = f'UPDATE tasks SET done = ?, {COMPLETED_SQL}, {VERSION_SQL} WHERE id = ?'
+DELETE_TASK_SQL = 'DELETE FROM tasks WHERE id = ?'
+UPDATE_CATEGORY_SQL = f'UPDATE tasks SET category = ?, {VERSION_SQL} WHERE id = ?'
+UPDATE_PRIORITY_SQL = f'UPDATE tasks SET priority = ?, {VERSION_SQL} WHERE id = ?'
+RENAME_CATEGORY_SQL = f'UPDATE tasks SET category = ?, {VERSION_SQL} WHERE category = ?'
+# Recurring tasks whose occurrences don't yet reach a date
+SELECT_DUE_RECURRENCES_SQL = f'''
+    SELECT {TASK_COLUMNS}, recurrence_through FROM tasks
+    WHERE recurrence IS NOT NULL AND recurrence_through < ?
+'''
+ANY_DUE_RECURRENCE_SQL = 'SELECT 1 FROM tasks WHERE recurrence IS NOT NULL AND recurrence_through < ? LIMIT 1'
+INSERT_OCCURRENCE_SQL = f'''
+    INSERT INTO tasks (name, done, priority, deadline, note, category, start_date, series_id, updated_at)
+    VALUES (?, 0, ?, ?, ?, ?, ?, ?, {NOW_SQL})
+'''
+UPDATE_RECURRENCE_THROUGH_SQL = 'UPDATE tasks SET recurrence_through = ? WHERE id = ?'
+UPDATE_RECURRENCE_SQL = f'UPDATE tasks SET recurrence = ?, recurrence_through = ?, {VERSION_SQL} WHERE id = ?'
+# Open occurrences from a date on, replaced when the rule changes
+DELETE_UPCOMING_SQL = 'DELETE FROM tasks WHERE series_id = ? AND done = 0 AND COALESCE(deadline, start_date) >= ?'
+SELECT_REVISION_SQL = 'SELECT value FROM revision WHERE id = 1'
+SELECT_LOG_STATE_SQL = 'SELECT value, logged_from FROM revision WHERE id = 1'
+PRUNE_CHANGES_SQL = 'DELETE FROM task_changes WHERE revision <= ?'
+UPDATE_LOGGED_FROM_SQL = 'UPDATE revision SET logged_from = MAX(logged_from, ?) WHERE id = 1'
+# Current values of every task changed after a revision; deleted tasks come
+# back with NULL columns
+SELECT_CHANGED_TASKS_SQL = f'''
+    SELECT changed.task_id, {TASK_COLUMNS}
+    FROM (SELECT DISTINCT task_id FROM task_changes WHERE revision > ? AND revision <= ?) AS changed
+    LEFT JOIN tasks ON tasks.id = changed.task_id
+    ORDER BY changed.task_id
+'''
+
+
+def _parse_date(value):
+    return datetime.date.fromisoformat(value) if value else None
+
+
+class Task(NamedTuple):
+    """One task as read from the database.
+
+    A tuple subclass, so a row costs one small object instead of a dict.
+    Dates are ``datetime.date`` or None; ``overdue`` is computed by the query.
+    ``version`` goes up by one with every update of the row. A recurring
+    task has its rule in ``recurrence``; its occurrences have ``series_id``.
+    """
+
+    id: int
+    name: str
+    done: bool
+    priority: str
+    deadline: datetime.date
+    note: str
+    category: str
+    start_date: datetime.date
+    version: int
+    updated_at: str
+    recurrence: str
+    series_id: int
+    overdue: bool
+
+
+class Changes(NamedTuple):
+    """What ``changes_since`` found: current values of the changed tasks
+    and the ids of deleted ones, as of ``revision``."""
+
+    revision: int
+    tasks: list
+    deleted: list
+
+
+class ConflictError(Exception):
+    """A compare-and-swap update found the task changed by someone else."""
+
+    def __init__(self, task):
+        super().__init__(f"Task {task.id} was changed by someone else (now at version {task.version})")
+        self.task = task
+
+
+def _row_to_task(row):
+    # Dates are parsed here once, so the UI never handles date strings
+    return Task(
+        row[0],
+        row[1],
+        bool(row[2]),
+        row[3],
+        _parse_date(row[4]),
+        row[5],
+        row[6],
+        _parse_date(row[7]),
+        row[8],
+        row[9],
+        row[10],
+        row[11],
+        bool(row[12]),
+    )
+
+
+@traced
+def get_tasks():
+    with connection() as conn:
+        return [_row_to_task(row) for row in conn.execute(SELECT_TASKS_SQL)]
+
+
+@traced
+def get_task(task_id):
+    """The task with ``task_id``, or None if there is none."""
+    with connection() as conn:
+        row = conn.execute(SELECT_TASK_SQL, (task_id,)).fetchone()
+    return _row_to_task(row) if row else None
+
+
+@traced
+def list_tasks(task_filter=TaskFilter()):
+    """Filtered tasks in display order, filtering and sorting done by SQLite."""
+    sql, params = select_tasks(task_filter)
+    with connection() as conn:
+        return [_row_to_task(row) for row in conn.execute(sql, params)]
+
+
+@traced
+def list_tasks_page(task_filter=TaskFilter(), after=None, limit=50):
+    """One page of ``list_tasks``.
+
+    Returns (tasks, next_cursor); pass next_cursor as ``after`` to get the
+    following page. next_cursor is None on the last page.
+    """
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit!r}")
+    sql, params = select_tasks(task_filter, after=after, limit=limit + 1)
+    with connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = tuple(rows[-1][TASK_COLUMN_COUNT:])
+    return [_row_to_task(row) for row in rows], next_cursor
+
+
+@traced
+def get_task_counts(task_filter=TaskFilter()):
+    """(total, done) number of tasks matching ``task_filter``."""
+    sql, params = count_tasks(task_filter)
+    with connection() as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+@traced
+def search_tasks(text, limit=50):
+    """Tasks whose name or note contain every word of ``text``.
+
+    Open tasks come first, each group ordered by bm25 relevance.
+    """
+    sql, params = select_tasks(TaskFilter(search=text))
+    with connection() as conn:
+        return [_row_to_task(row) for row in conn.execute(f'{sql} LIMIT ?', params + [limit])]
+
+
+@traced
+def get_categories():
+    with connection() as conn:
+        return [row[0] for row in conn.execute(SELECT_CATEGORIES_SQL)]
+
+
+@traced
+def get_category_usage():
+    """(category, number of tasks) of every category, by name."""
+    with connection() as conn:
+        return conn.execute(SELECT_CATEGORY_USAGE_SQL).fetchall()
+
+
+def get_revision():
+    """Counter that changes whenever any task is added, changed or deleted."""
+    with connection() as conn:
+        return conn.execute(SELECT_REVISION_SQL).fetchone()[0]
+
+
+@traced
+def changes_since(revision):
+    """Tasks added, changed or deleted after ``revision``, as Changes.
+
+    Returns None when the change log doesn't reach back to ``revision``
+    (it predates the log, or the log was pruned); reload everything then.
+    Pass the returned revision to the next call.
+    """
+    with connection() as conn:
+        current, logged_from = conn.execute(SELECT_LOG_STATE_SQL).fetchone()
+        if revision >= current:
+            return Changes(current, [], [])
+        if revision < logged_from:
+            return None
+        rows = conn.execute(SELECT_CHANGED_TASKS_SQL, (revision, current)).fetchall()
+    changes = Changes(current, [], [])
+    for row in rows:
+        if row[1] is None:
+            changes.deleted.append(row[0])
+        else:
+            changes.tasks.append(_row_to_task(row[1:]))
+    return changes
+
+
+def _conflict(conn, task_id):
+    # Raised when a checked update changed nothing although the task exists
+    row = conn.execute(SELECT_TASK_SQL, (task_id,)).fetchone()
+    if row is not None:
+        raise ConflictError(_row_to_task(row))
+
+
+# Writes are @serialized: they run on the writer thread, which commits
+# concurrent writes from all sessions together.
+
+@traced
+@serialized
+def add_task(name, priority, deadline, note, category, start_date):
+    """Add an open task and return its id."""
+    with transaction() as conn:
+        return conn.execute(INSERT_TASK_SQL, (name, False, priority, to_iso(deadline), note, category, to_iso(start_date))).lastrowid
+
+
+@traced
+@serialized
+def edit_task(task_id, name, priority, deadline, note, category, start_date, expected_version=None):
+    """Update a task. With ``expected_version`` only if the task is still
+    at that version, raising ConflictError otherwise."""
+    with transaction() as conn:
+        params = (name, priority, to_iso(deadline), note, category, to_iso(start_date), task_id, expected_version)
+        count = conn.execute(UPDATE_TASK_SQL, params).rowcount
+        if not count and expected_version is not None:
+            _conflict(conn, task_id)
+        return count
+
+
+@traced
+@serialized
+def update_task_status(task_id, done, expected_version=None):
+    with transaction() as conn:
+        count = conn.execute(UPDATE_STATUS_SQL, (done, done, task_id, expected_version)).rowcount
+        if not count and expected_version is not None:
+            _conflict(conn, task_id)
+        return count
+
+
+@traced
+@serialized
+def delete_task(task_id):
+    with transaction() as conn:
+        return conn.execute(DELETE_TASK_SQL, (task_id,)).rowcount
+
+
+# Batch operations: one transaction and one prepared statement for any number
+# of tasks. Each returns the number of tasks changed.
+
+@traced
+@serialized
+def add_tasks(rows):
+    """Insert INSERT_TASK_SQL parameter tuples, e.g. from importer.normalize."""
+    with transaction() as conn:
+        return conn.executemany(INSERT_TASK_SQL, rows).rowcount
+
+
+@traced
+@serialized
+def update_tasks_status(task_ids, done):
+    with transaction() as conn:
+        return conn.executemany(UPDATE_STATUSES_SQL, [(done, done, task_id) for task_id in task_ids]).rowcount
+
+
+@traced
+@serialized
+def delete_tasks(task_ids):
+    with transaction() as conn:
+        return conn.executemany(DELETE_TASK_SQL, [(task_id,) for task_id in task_ids]).rowcount
+
+
+@traced
+@serialized
+def set_category(task_ids, category):
+    with transaction() as conn:
+        return conn.executemany(UPDATE_CATEGORY_SQL, [(category, task_id) for task_id in task_ids]).rowcount
+
+
+@traced
+@serialized
+def set_priority(task_ids, priority):
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}, expected one of {', '.join(PRIORITIES)}")
+    with transaction() as conn:
+        return conn.executemany(UPDATE_PRIORITY_SQL, [(priority, task_id) for task_id in task_ids]).rowcount
+
+
+@traced
+@serialized
+def prune_changes(revision):
+    """Drop change log entries up to ``revision``. Clients that last saw an
+    older revision get None from changes_since and reload."""
+    with transaction() as conn:
+        conn.execute(UPDATE_LOGGED_FROM_SQL, (revision,))
+        return conn.execute(PRUNE_CHANGES_SQL, (revision,)).rowcount
+
+
+@traced
+@serialized
+def rename_category(old, new):
+    """Move every task in category ``old`` to ``new`` and return how many.
+
+    If ``new`` already exists the two are merged. Either way it is one
+    UPDATE over the category index; the triggers create ``new`` and drop
+    ``old`` once no task uses it.
+    """
+    if old == new:
+        return 0
+    with transaction() as conn:
+        return conn.execute(RENAME_CATEGORY_SQL, (new, old)).rowcount
+
+
+# Recurring tasks. The task with the rule is the first occurrence; the
+# others are created as plain tasks, only up to RECURRENCE_WINDOW ahead, so
+# the table grows with the window and not with the length of the series.
+
+def _anchor(task):
+    # The date a rule repeats
+    return task.deadline or task.start_date
+
+
+def _occurrence_rows(task, days):
+    # INSERT_OCCURRENCE_SQL parameters for each date, keeping the task's
+    # start to deadline span
+    span = task.deadline - task.start_date if task.deadline and task.start_date else None
+    for day in days:
+        if task.deadline:
+            deadline, start_date = day, (day - span if span is not None else None)
+        else:
+            deadline, start_date = None, day
+        yield (task.name, task.priority, to_iso(deadline), task.note, task.category, to_iso(start_date), task.id)
+
+
+def _materialize(conn, templates, until):
+    # One generator pipeline over every due rule: dates -> rows -> one
+    # executemany, without building the list of occurrences
+    rules = [(task, parse_rule(task.recurrence), through) for task, through in templates if _anchor(task)]
+    rows = itertools.chain.from_iterable(
+        _occurrence_rows(task, between(rule, _anchor(task), through, until)) for task, rule, through in rules
+    )
+    count = conn.executemany(INSERT_OCCURRENCE_SQL, rows).rowcount
+    # A template dated after ``until`` got nothing yet; its own date stays
+    # covered, or the next run would add an occurrence next to it
+    conn.executemany(UPDATE_RECURRENCE_THROUGH_SQL, [
+        (END_OF_TIME if ends_by(rule, _anchor(task), until) else max(through, until).isoformat(), task.id)
+        for task, rule, through in rules
+    ])
+    return max(count, 0)
+
+
+@traced
+@serialized
+def set_recurrence(task_id, rule, today=None):
+    """Repeat a task by ``rule`` (see todo.recurrence), or stop with None.
+
+    The rule repeats the task's deadline, or its start date if it has no
+    deadline. Open occurrences from today on are replaced by those of the
+    new rule. Returns the number of occurrences created.
+    """
+    rule = normalize_rule(rule)
+    today = today or datetime.date.today()
+    with transaction() as conn:
+        row = conn.execute(SELECT_TASK_SQL, (task_id,)).fetchone()
+        if row is None:
+            return 0
+        task = _row_to_task(row)
+        if rule and not _anchor(task):
+            raise ValueError("A recurring task needs a deadline or a start date")
+        conn.execute(DELETE_UPCOMING_SQL, (task_id, today.isoformat()))
+        # Only upcoming occurrences are created, not the ones already past
+        through = max(_anchor(task), today - datetime.timedelta(days=1)) if rule else None
+        conn.execute(UPDATE_RECURRENCE_SQL, (rule, to_iso(through), task_id))
+        if rule is None:
+            return 0
+        return _materialize(conn, [(task._replace(recurrence=rule), through)], today + RECURRENCE_WINDOW)
+
+
+@serialized
+def _materialize_due(until):
+    with transaction() as conn:
+        # Read again on the writer: another call may have done it meanwhile
+        templates = [
+            (_row_to_task(row), _parse_date(row[TASK_COLUMN_COUNT]))
+            for row in conn.execute(SELECT_DUE_RECURRENCES_SQL, (until.isoformat(),)).fetchall()
+        ]
+        return _materialize(conn, templates, until)
+
+
+@traced
+def materialize_occurrences(until=None):
+    """Create the occurrences of recurring tasks up to ``until`` (default
+    RECURRENCE_WINDOW from today) and return how many.
+
+    Meant to be called before reading tasks: when nothing is due it is one
+    read of the small recurrence index and takes no write lock.
+    """
+    until = until or datetime.date.today() + RECURRENCE_WINDOW
+    with connection() as conn:
+        if conn.execute(ANY_DUE_RECURRENCE_SQL, (until.isoformat(),)).fetchone() is None:
+            return 0
+    return _materialize_due(until)
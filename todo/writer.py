@@ -0,0 +1,238 @@
+import atexit
+import concurrent.futures
+import contextvars
+import functools
+import queue
+import sqlite3
+import threading
+import time
+
+from . import profiling
+from .db import get_pool
+
+# Longest a write waits for others to join its commit, and the most writes
+# committed together
+MAX_DELAY = 0.002
+MAX_BATCH = 256
+
+# A group that finds the database locked by another process (after the
+# connection's busy_timeout) is retried this often, backing off from RETRY_DELAY
+MAX_RETRIES = 3
+RETRY_DELAY = 0.05
+
+_STOP = object()
+
+
+class _Operation:
+    __slots__ = ('func', 'args', 'kwargs', 'context', 'future')
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        # Run in the caller's context, so a profiled rerun still sees its spans
+        self.context = contextvars.copy_context()
+        self.future = concurrent.futures.Future()
+
+
+class Writer:
+    """One thread that runs every write, committing them in groups.
+
+    ``submit(func, *args)`` queues a call of a write helper (or any function
+    doing its writes through ``transaction()``) and returns a Future. The
+    thread takes whatever is queued, waiting up to ``max_delay`` for more,
+    and runs the whole group in one transaction: one write lock acquisition
+    and one commit for up to ``max_batch`` writes instead of one each.
+
+    Every operation runs in its own savepoint, so one that raises is rolled
+    back and gets the exception while the rest of the group commits. Futures
+    are resolved only after the commit, so a result means the write is stored.
+    If the write lock can't be taken the group is retried ``max_retries``
+    times with exponential backoff before its callers get the error.
+    """
+
+    def __init__(self, pool=None, max_delay=MAX_DELAY, max_batch=MAX_BATCH,
+                 max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+        self.pool = pool or get_pool()
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.batches = 0
+        self.operations = 0
+        self.retries = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    @property
+    def thread(self):
+        return self._thread
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def _start(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("writer is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='todo-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        if self._thread is None or self._closed:
+            self._start()
+        operation = _Operation(func, args, kwargs)
+        self._queue.put(operation)
+        return operation.future
+
+    def call(self, func, *args, **kwargs):
+        """Run ``func`` on the writer thread and wait for its committed result."""
+        if threading.current_thread() is self._thread:
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def close(self):
+        """Finish the queued writes and stop the thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'operations': self.operations,
+            'per_batch': self.operations / self.batches if self.batches else 0.0,
+            'retries': self.retries,
+        }
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                operation = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if operation is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(operation)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            self._commit(self._collect(first))
+
+    def _commit(self, batch):
+        batch = [operation for operation in batch if operation.future.set_running_or_notify_cancel()]
+        attempt = 0
+        while True:
+            try:
+                results = self._execute(batch)
+                break
+            except sqlite3.OperationalError as e:
+                if attempt < self.max_retries and _is_busy(e):
+                    time.sleep(self.retry_delay * 2 ** attempt)
+                    attempt += 1
+                    self.retries += 1
+                    continue
+                error = e
+            except BaseException as e:
+                error = e
+            # The transaction itself failed, nothing in the group was stored
+            for operation in batch:
+                operation.future.set_exception(error)
+            return
+        self.batches += 1
+        self.operations += len(results)
+        for operation, result, error in results:
+            if error is None:
+                operation.future.set_result(result)
+            else:
+                operation.future.set_exception(error)
+
+    def _execute(self, batch):
+        results = []
+        with self.pool.transaction() as conn:
+            for operation in batch:
+                conn.execute('SAVEPOINT operation')
+                # Count the statements for the caller's profiled rerun, as
+                # the pool does for connections checked out by the caller
+                profiler = operation.context.run(profiling.active)
+                if profiler is not None:
+                    conn.set_trace_callback(profiler.on_statement)
+                try:
+                    result = operation.context.run(operation.func, *operation.args, **operation.kwargs)
+                except Exception as e:
+                    conn.set_trace_callback(None)
+                    conn.execute('ROLLBACK TO operation')
+                    conn.execute('RELEASE operation')
+                    results.append((operation, None, e))
+                else:
+                    conn.set_trace_callback(None)
+                    conn.execute('RELEASE operation')
+                    results.append((operation, result, None))
+        return results
+
+
+def _is_busy(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """The writer for the current pool, created on first use and again
+    after the previous one was closed (e.g. by an API shutdown)."""
+    global _writer
+    pool = get_pool()
+    writer = _writer
+    if writer is None or writer.pool is not pool or writer.closed:
+        with _writer_lock:
+            if _writer is None or _writer.pool is not pool or _writer.closed:
+                previous, _writer = _writer, Writer(pool)
+                atexit.register(_writer.close)
+                if previous is not None:
+                    previous.close()
+            writer = _writer
+    return writer
+
+
+def set_writer(writer):
+    global _writer
+    with _writer_lock:
+        _writer = writer
+    return writer
+
+
+def serialized(func):
+    """Run calls of the write helper ``func`` on the writer thread.
+
+    Callers block until their write is committed, as before, but writes from
+    all threads (e.g. every Streamlit session) share one connection and one
+    commit per group instead of contending for the write lock. Calls on the
+    writer thread, or inside a transaction the caller already holds, run
+    directly, since queueing them would wait on the caller's own lock.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        writer = get_writer()
+        if threading.current_thread() is writer.thread or writer.pool.in_transaction():
+            return func(*args, **kwargs)
+        return writer.submit(func, *args, **kwargs).result()
+    return wrapper
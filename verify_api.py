@@ -0,0 +1,141 @@
+import base64
+import datetime
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import uvicorn
+
+from todo.api import create_app
+
+# A scratch database, so the real todo.db is left alone
+path = os.path.join(tempfile.mkdtemp(), "verify_api.db")
+
+# Serve the API on a free port for the length of the script
+sock = socket.socket()
+sock.bind(("127.0.0.1", 0))
+base_url = "http://127.0.0.1:%d" % sock.getsockname()[1]
+server = uvicorn.Server(uvicorn.Config(create_app(path), log_level="warning"))
+thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+thread.start()
+while not server.started:
+    time.sleep(0.01)
+
+
+def request(method, url, body=None, headers=None):
+    """(status, headers, decoded JSON body or None) of one API call."""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base_url + url, data, headers or {}, method=method)
+    if data is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req) as response:
+            status, response_headers, text = response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        status, response_headers, text = e.code, e.headers, e.read()
+    return status, response_headers, json.loads(text) if text else None
+
+
+def token(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+# Test conditional GETs
+print("Testing ETag...")
+status, headers, body = request("GET", "/tasks")
+assert status == 200 and body["tasks"] == [] and body["total"] == 0
+etag = headers["ETag"]
+status, headers, body = request("GET", "/tasks", headers={"If-None-Match": etag})
+assert status == 304 and headers["ETag"] == etag and body is None
+status, _, task = request("POST", "/tasks", {"name": "Write report", "priority": "High", "category": "Work"})
+assert status == 201 and task["version"] == 1
+# Any write makes the old ETag stale
+status, headers, body = request("GET", "/tasks", headers={"If-None-Match": etag})
+assert status == 200 and headers["ETag"] != etag and [t["name"] for t in body["tasks"]] == ["Write report"]
+status, _, _ = request("GET", f"/tasks/{task['id']}", headers={"If-None-Match": headers["ETag"]})
+assert status == 304
+print("ETag Passed!")
+
+# Test compare-and-swap updates
+print("Testing Version Conflicts...")
+url = f"/tasks/{task['id']}"
+status, _, task = request("PATCH", url, {"name": "Write the report", "version": 1})
+assert status == 200 and task["version"] == 2 and task["name"] == "Write the report"
+# A client still at version 1 is refused and gets the current task
+status, _, body = request("PATCH", url, {"done": True, "version": 1})
+assert status == 409 and body["task"]["version"] == 2 and not body["task"]["done"]
+status, _, task = request("PATCH", url, {"done": True, "version": 2})
+assert status == 200 and task["done"]
+assert request("PATCH", "/tasks/999999", {"name": "Gone"})[0] == 404
+print("Version Conflicts Passed!")
+
+# Test page cursors
+print("Testing Cursors...")
+status, _, body = request("POST", "/tasks/batch", {"tasks": [{"name": f"task {i:02}", "category": "Home"} for i in range(25)]})
+assert status == 201 and body["created"] == 25
+names, after = [], ""
+while True:
+    status, _, body = request("GET", f"/tasks?category=Home&limit=10&after={after}")
+    assert status == 200 and body["total"] == 25
+    names += [t["name"] for t in body["tasks"]]
+    if body["next"] is None:
+        break
+    after = body["next"]
+assert sorted(names) == [f"task {i:02}" for i in range(25)] and len(set(names)) == 25
+for bad in ("%%%", "bm90IGpzb24", token({"a": 1}), token(["x"]), token([True] * 5), token([[1]] * 5)):
+    status, _, body = request("GET", f"/tasks?after={bad}")
+    assert status == 400 and "cursor" in body["error"], (bad, status, body)
+# A cursor for the display order doesn't fit a search's sort key
+assert request("GET", f"/tasks?search=task&after={after}")[0] == 400
+for limit in ("0", "-3", "501", "x"):
+    assert request("GET", f"/tasks?limit={limit}")[0] == 400
+print("Cursors Passed!")
+
+# Test batch validation
+print("Testing Batch Validation...")
+before = request("GET", "/tasks")[2]["total"]
+status, _, body = request("POST", "/tasks/batch", {"tasks": [
+    {"name": "fine"},
+    {"name": "bad priority", "priority": "Urgent"},
+    {"name": "bad date", "deadline": "2024-02-30"},
+    "not an object",
+    {"priority": "Low"},
+]})
+assert status == 422 and [r["index"] for r in body["rejected"]] == [1, 2, 3, 4], body
+# Nothing of a rejected batch is stored
+assert request("GET", "/tasks")[2]["total"] == before
+assert request("POST", "/tasks/batch", {"tasks": {"name": "x"}})[0] == 400
+assert request("POST", "/tasks/batch/complete", {"ids": ["1"]})[0] == 400
+assert request("POST", "/tasks/batch/priority", {"ids": [1], "value": "Urgent"})[0] == 422
+assert request("POST", "/tasks/batch/explode", {"ids": [1]})[0] == 404
+print("Batch Validation Passed!")
+
+# Test recurring tasks
+print("Testing Recurrence...")
+monday = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+status, _, series = request("POST", "/tasks", {"name": "Weekly review", "deadline": monday.isoformat(), "recurrence": "weekly"})
+assert status == 201 and series["recurrence"] == "FREQ=WEEKLY"
+body = request("GET", "/tasks?search=weekly+review&limit=500")[2]
+occurrences = [t for t in body["tasks"] if t["series_id"] == series["id"]]
+assert occurrences and all(datetime.date.fromisoformat(t["deadline"]).weekday() == 0 for t in occurrences)
+status, _, series = request("PATCH", f"/tasks/{series['id']}", {"recurrence": "FREQ=MONTHLY"})
+assert status == 200 and series["recurrence"] == "FREQ=MONTHLY"
+body = request("GET", "/tasks?search=weekly+review&limit=500")[2]
+assert len([t for t in body["tasks"] if t["series_id"] == series["id"]]) < len(occurrences)
+status, _, series = request("PATCH", f"/tasks/{series['id']}", {"recurrence": None})
+assert status == 200 and series["recurrence"] is None
+assert request("POST", "/tasks", {"name": "x", "deadline": "2024-01-01", "recurrence": "FREQ=HOURLY"})[0] == 422
+assert request("POST", "/tasks", {"name": "no date", "recurrence": "daily"})[0] == 422
+# The task of a rejected rule isn't stored either
+assert request("GET", "/tasks?search=no+date")[2]["total"] == 0
+assert request("PATCH", f"/tasks/{series['id']}", {"recurrence": 7})[0] == 422
+print("Recurrence Passed!")
+
+server.should_exit = True
+thread.join()
+print("All API tests passed!")
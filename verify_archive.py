@@ -0,0 +1,92 @@
+import datetime
+import json
+import os
+import tempfile
+
+from todo import (
+    ConnectionPool,
+    TaskFilter,
+    add_task,
+    archive_tasks,
+    changes_since,
+    delete_task,
+    export_tasks,
+    get_revision,
+    get_task,
+    get_task_counts,
+    init_db,
+    list_tasks_page,
+    restore_tasks,
+    set_pool,
+    set_recurrence,
+    update_tasks_status,
+)
+from todo.stats import get_summary
+
+# A scratch database, so the real todo.db is left alone
+set_pool(ConnectionPool(os.path.join(tempfile.mkdtemp(), "verify_archive.db")))
+init_db()
+archived = TaskFilter(archived=True)
+# Everything completed so far counts as done long ago
+later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=31)
+
+
+def archived_names(search=''):
+    tasks, _ = list_tasks_page(TaskFilter(search=search, archived=True), None, 100)
+    return sorted(task.name for task in tasks)
+
+
+# Test archiving
+print("Testing Archive Tasks...")
+ids = [add_task(f"task {i}", "Low", None, "", "Work", None) for i in range(10)]
+series = add_task("Weekly review", "High", datetime.date.today(), "", "Work", None)
+set_recurrence(series, "weekly")
+update_tasks_status(ids[:6] + [series], True)
+open_tasks = get_task_counts()[0] - 7
+# Nothing was completed more than 30 days ago yet
+assert archive_tasks(30) == 0
+revision = get_revision()
+# Small batches, so the loop over batches runs too
+assert archive_tasks(30, batch_size=4, now=later) == 6
+assert get_task_counts() == (open_tasks + 1, 1)
+assert get_task_counts(archived) == (6, 6)
+assert get_summary().total == open_tasks + 1
+# The recurring task holds its rule, so it stays
+assert get_task(series).recurrence == "FREQ=WEEKLY"
+assert get_task(ids[0]) is None
+assert archived_names("task 5") == ["task 5"]
+# Change log clients see archived tasks as deleted
+assert sorted(changes_since(revision).deleted) == ids[:6]
+print("Archive Tasks Passed!")
+
+# Test exporting with and without the archive
+print("Testing Archive Export...")
+active = export_tasks(fmt="jsonl").read().splitlines()
+everything = [json.loads(line) for line in export_tasks(fmt="jsonl", include_archive=True).read().splitlines()]
+assert len(everything) == len(active) + 6
+assert {record["id"] for record in everything[len(active):]} == set(ids[:6])
+print("Archive Export Passed!")
+
+# Test restoring
+print("Testing Restore Tasks...")
+assert restore_tasks([ids[0], ids[1], 999999]) == 2
+task = get_task(ids[0])
+assert task.name == "task 0" and task.done and task.category == "Work"
+assert get_task_counts(archived) == (4, 4)
+# Restored tasks keep their completion time, so they are archived again
+assert archive_tasks(30, now=later) == 2
+print("Restore Tasks Passed!")
+
+# Test restoring an occurrence whose series was deleted meanwhile
+print("Testing Restore Without Series...")
+occurrence, _ = list_tasks_page(TaskFilter(search="Weekly review", done=False), None, 1)
+occurrence = occurrence[0]
+assert occurrence.series_id == series
+update_tasks_status([occurrence.id], True)
+assert archive_tasks(30, now=later) == 1
+delete_task(series)
+assert restore_tasks([occurrence.id]) == 1
+assert get_task(occurrence.id).series_id is None
+print("Restore Without Series Passed!")
+
+print("All archive tests passed!")
@@ -1,6 +1,6 @@
 import sqlite3
 import os
-from app import init_db, add_task, get_tasks, edit_task, delete_task
+from todo import init_db, add_task, get_tasks, edit_task, delete_task
 
 # Setup
 if os.path.exists("todo.db"):
@@ -9,24 +9,24 @@ init_db()
 
 # Test Add
 print("Testing Add Task...")
-add_task("Test Task", "High", "2023-12-31", "This is a note", "Work")
+add_task("Test Task", "High", "2023-12-31", "This is a note", "Work", None)
 tasks = get_tasks()
 assert len(tasks) == 1
-assert tasks[0]['name'] == "Test Task"
-assert tasks[0]['priority'] == "High"
-assert tasks[0]['note'] == "This is a note"
-assert tasks[0]['category'] == "Work"
+assert tasks[0].name == "Test Task"
+assert tasks[0].priority == "High"
+assert tasks[0].note == "This is a note"
+assert tasks[0].category == "Work"
 print("Add Task Passed!")
 
 # Test Edit
 print("Testing Edit Task...")
-task_id = tasks[0]['id']
-edit_task(task_id, "Updated Task", "Medium", "2024-01-01", "Updated Note", "Personal")
+task_id = tasks[0].id
+edit_task(task_id, "Updated Task", "Medium", "2024-01-01", "Updated Note", "Personal", None)
 tasks = get_tasks()
-assert tasks[0]['name'] == "Updated Task"
-assert tasks[0]['priority'] == "Medium"
-assert tasks[0]['note'] == "Updated Note"
-assert tasks[0]['category'] == "Personal"
+assert tasks[0].name == "Updated Task"
+assert tasks[0].priority == "Medium"
+assert tasks[0].note == "Updated Note"
+assert tasks[0].category == "Personal"
 print("Edit Task Passed!")
 
 # Test Delete
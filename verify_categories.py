@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import tempfile
+
+from todo import (
+    ConnectionPool,
+    add_task,
+    delete_task,
+    edit_task,
+    get_categories,
+    get_category_usage,
+    get_task,
+    init_db,
+    rename_category,
+    set_pool,
+)
+from todo.migrations import MIGRATIONS
+
+# A scratch database, so the real todo.db is left alone
+path = os.path.join(tempfile.mkdtemp(), "verify_categories.db")
+
+# Test the migration from the free text category column
+print("Testing Categories Migration...")
+conn = sqlite3.connect(path, isolation_level=None)
+for step in MIGRATIONS[:9]:
+    step(conn)
+conn.execute("PRAGMA user_version = 9")
+conn.executemany(
+    "INSERT INTO tasks (name, done, priority, category) VALUES (?, 0, 'Low', ?)",
+    [("a", "Work"), ("b", "Work"), ("c", "Home"), ("d", None), ("e", "Gone")],
+)
+# The highest id is deleted, so only sqlite_sequence remembers it
+conn.execute("DELETE FROM tasks WHERE name = 'e'")
+ids = conn.execute("SELECT id, name FROM tasks ORDER BY id").fetchall()
+conn.close()
+
+set_pool(ConnectionPool(path))
+init_db()
+assert get_category_usage() == [("Home", 1), ("Work", 2)]
+assert [(task_id, get_task(task_id).name) for task_id, _ in ids] == ids
+# Ids of deleted tasks are still not reused
+assert add_task("f", "Low", None, "", "Home", None) == 6
+conn = sqlite3.connect(path)
+assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+print("Categories Migration Passed!")
+
+# Test the foreign key
+print("Testing Category Foreign Key...")
+conn.execute("PRAGMA foreign_keys = ON")
+for statement in ("DELETE FROM categories WHERE name = 'Work'", "UPDATE categories SET name = 'Job' WHERE name = 'Work'"):
+    try:
+        conn.execute(statement)
+    except sqlite3.IntegrityError:
+        conn.rollback()
+    else:
+        raise AssertionError(f"{statement} broke the foreign key")
+conn.close()
+print("Category Foreign Key Passed!")
+
+# Test the trigger kept counts
+print("Testing Category Counts...")
+task_id = add_task("g", "Low", None, "", "Errands", None)
+assert ("Errands", 1) in get_category_usage()
+edit_task(task_id, "g", "Low", None, "", "Home", None)
+assert "Errands" not in get_categories()
+delete_task(task_id)
+assert get_category_usage() == [("Home", 2), ("Work", 2)]
+print("Category Counts Passed!")
+
+# Test renaming and merging
+print("Testing Rename Category...")
+assert rename_category("Work", "Job") == 2
+assert get_category_usage() == [("Home", 2), ("Job", 2)]
+assert rename_category("Job", "Home") == 2
+assert get_category_usage() == [("Home", 4)]
+assert rename_category("Missing", "Home") == 0
+print("Rename Category Passed!")
+
+print("All category tests passed!")
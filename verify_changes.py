@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+from todo import (
+    ConflictError,
+    ConnectionPool,
+    add_task,
+    changes_since,
+    delete_task,
+    edit_task,
+    get_revision,
+    get_task,
+    init_db,
+    prune_changes,
+    set_pool,
+    trim_change_log,
+    update_task_status,
+)
+
+# A scratch database, so the real todo.db is left alone
+set_pool(ConnectionPool(os.path.join(tempfile.mkdtemp(), "verify_changes.db")))
+init_db()
+
+
+def expect_conflict(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except ConflictError as e:
+        return e.task
+    raise AssertionError(f"{func.__name__} overwrote a newer version")
+
+
+# Test compare-and-swap updates
+print("Testing Versioned Updates...")
+task_id = add_task("Write report", "High", None, "", "Work", None)
+task = get_task(task_id)
+assert task.version == 1
+assert edit_task(task_id, "Write the report", "High", None, "", "Work", None, expected_version=1) == 1
+assert get_task(task_id).version == 2
+# A second client still holding version 1 is refused and told the current one
+current = expect_conflict(edit_task, task_id, "Report", "Low", None, "", "Work", None, expected_version=1)
+assert current.version == 2 and current.name == "Write the report"
+assert expect_conflict(update_task_status, task_id, True, expected_version=1).version == 2
+assert not get_task(task_id).done
+assert update_task_status(task_id, True, expected_version=2) == 1
+# Without a version the update always applies
+assert update_task_status(task_id, False) == 1
+assert get_task(task_id).version == 4
+# A missing task isn't a conflict, nothing is changed
+assert edit_task(999999, "Gone", "Low", None, "", "Work", None, expected_version=1) == 0
+print("Versioned Updates Passed!")
+
+# Test fetching the changes since a revision
+print("Testing Changes Since...")
+revision = get_revision()
+assert changes_since(revision) == (revision, [], [])
+other_id = add_task("Call Bob", "Low", None, "", "Home", None)
+update_task_status(task_id, True)
+delete_task(other_id)
+gone_id = add_task("Book flights", "Medium", None, "", "Home", None)
+changes = changes_since(revision)
+assert changes.revision == get_revision() == revision + 4
+assert [task.id for task in changes.tasks] == [task_id, gone_id]
+assert changes.tasks[0].done
+assert changes.deleted == [other_id]
+# Polling again from the returned revision finds nothing new
+assert changes_since(changes.revision) == (changes.revision, [], [])
+print("Changes Since Passed!")
+
+# Test pruning the change log
+print("Testing Prune Changes...")
+latest = get_revision()
+assert prune_changes(revision) > 0
+# Clients that saw a pruned revision must reload everything
+assert changes_since(revision - 1) is None
+assert changes_since(revision).deleted == [other_id]
+add_task("Water plants", "Low", None, "", "Home", None)
+add_task("Pay rent", "High", None, "", "Home", None)
+assert trim_change_log(keep=1) == latest - revision + 1
+assert changes_since(latest) is None
+assert [task.name for task in changes_since(latest + 1).tasks] == ["Pay rent"]
+# Nothing older left to drop
+assert trim_change_log(keep=1) == 0
+assert changes_since(get_revision()) == (get_revision(), [], [])
+print("Prune Changes Passed!")
+
+print("All change log tests passed!")
@@ -0,0 +1,92 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# A scratch database, so the real todo.db is left alone
+path = os.path.join(tempfile.mkdtemp(), "verify_cli.db")
+
+
+def todo(*argv, stdin=None):
+    """(exit code, stdout, stderr) of one ``todo`` command."""
+    result = subprocess.run(
+        [sys.executable, "-m", "todo.cli", "--db", path, *argv],
+        input=stdin, capture_output=True, text=True,
+    )
+    return result.returncode, result.stdout, result.stderr
+
+
+def listed(*argv):
+    code, out, err = todo("list", "--format", "jsonl", *argv)
+    assert code == 0, err
+    return [json.loads(line) for line in out.splitlines()]
+
+
+# Test adding and listing
+print("Testing Add and List...")
+code, out, _ = todo("add", "Write report", "--priority", "High", "--deadline", "2024-06-01", "--category", "Work")
+assert code == 0
+report_id = int(out)
+for i in range(16):
+    assert todo("add", f"task {i:02}", "--priority", "Low")[0] == 0
+tasks = listed()
+assert len(tasks) == 17 and tasks[0]["id"] == report_id
+assert tasks[0]["deadline"] == "2024-06-01" and tasks[0]["category"] == "Work"
+assert [task["id"] for task in listed("--limit", "3")] == [task["id"] for task in tasks[:3]]
+assert [task["name"] for task in listed("--category", "Work")] == ["Write report"]
+code, out, _ = todo("list", "--priority", "High")
+assert code == 0 and "Write report" in out and "[!]" in out
+print("Add and List Passed!")
+
+# Test editing and completing
+print("Testing Edit...")
+assert todo("edit", str(report_id), "--name", "Write the report", "--note", "draft first")[0] == 0
+task = listed("--search", "report")[0]
+assert task["name"] == "Write the report" and task["note"] == "draft first" and task["priority"] == "High"
+assert task["version"] == 2
+assert todo("done", str(report_id))[0] == 0
+assert [task["id"] for task in listed("--done")] == [report_id]
+code, _, err = todo("edit", "999999", "--name", "Gone")
+assert code == 1 and "not found" in err
+code, _, err = todo("done", str(report_id), "999999")
+assert code == 1 and "1 of 2 tasks not found" in err
+print("Edit Passed!")
+
+# Test that a batch is all or nothing
+print("Testing Batch...")
+code, out, _ = todo("batch", stdin='add "from batch" --category Home\n# a comment\n\ndone %d\n' % report_id)
+assert code == 0 and len(out.split()) == 1
+assert [task["name"] for task in listed("--category", "Home")] == ["from batch"]
+code, out, err = todo("batch", stdin="add kept\nadd dropped --category Home\ndelete 999999\n")
+assert code == 1 and "line 3" in err and "nothing was applied" in err
+# No ids of rolled back tasks are printed
+assert out == ""
+assert [task["name"] for task in listed("--category", "Home")] == ["from batch"]
+assert not listed("--search", "kept")
+code, _, err = todo("batch", stdin="add ok\nfrobnicate 1\n")
+assert code == 1 and "line 2: invalid command" in err
+assert not listed("--search", "ok")
+print("Batch Passed!")
+
+# Test argument validation
+print("Testing Argument Validation...")
+for argv in (
+    ("list", "--limit", "0"),
+    ("list", "--limit", "-3"),
+    ("list", "--limit", "many"),
+    ("search", "report", "--limit", "0"),
+    ("add", "x", "--deadline", "2024-02-30"),
+    ("add", "x", "--priority", "Urgent"),
+    ("done", "one"),
+    ("list", "--done", "--open"),
+):
+    code, out, err = todo(*argv)
+    # Rejected by argparse, with a usage message instead of a traceback
+    assert code == 2 and "Traceback" not in err and out == "", (argv, err)
+code, _, err = todo("add", "x", "--repeat", "FREQ=HOURLY", "--deadline", "2024-06-01")
+assert code == 1 and "Traceback" not in err
+assert not listed("--search", "x")
+print("Argument Validation Passed!")
+
+print("All CLI tests passed!")
@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+
+from todo import ConnectionPool, add_task, export_tasks, get_tasks, init_db, set_pool, update_tasks_status
+from todo.importer import import_tasks, normalize
+
+# Scratch databases, so the real todo.db is left alone
+directory = tempfile.mkdtemp()
+
+
+def use_database(name):
+    set_pool(ConnectionPool(os.path.join(directory, name)))
+    init_db()
+
+
+def rejected(record):
+    try:
+        normalize(record)
+    except ValueError as e:
+        return str(e)
+    raise AssertionError(f"{record} was accepted")
+
+
+def fields(task):
+    return task[1:8]
+
+
+# Test validating records
+print("Testing Normalize...")
+assert normalize({"name": " Write report ", "priority": "high", "deadline": "2024-06-01", "done": "yes"}) == (
+    "Write report", True, "High", "2024-06-01", None, "General", None,
+)
+assert normalize({"name": "x", "done": ""}) == ("x", False, "Medium", None, None, "General", None)
+assert normalize({"name": "x", "done": True, "note": 5})[1:5] == (True, "Medium", None, "5")
+assert "missing task name" in rejected({"priority": "Low"})
+assert "missing task name" in rejected({"name": "   "})
+assert "unknown priority" in rejected({"name": "x", "priority": "Urgent"})
+assert "invalid deadline" in rejected({"name": "x", "deadline": "2024-02-30"})
+assert "invalid deadline" in rejected({"name": "x", "deadline": "01/06/2024"})
+assert "invalid start date" in rejected({"name": "x", "start_date": "tomorrow"})
+assert "invalid done value" in rejected({"name": "x", "done": "maybe"})
+print("Normalize Passed!")
+
+# Test the header names accepted
+print("Testing Header Aliases...")
+for record in (
+    {"Task Name": "x", "Deadline": "2024-06-01", "Start Date": "2024-05-01", "Category": "Work"},
+    {"name": "x", "deadline": "2024-06-01", "start_date": "2024-05-01", "category": "Work"},
+    {"TITLE": "x", "Due": "2024-06-01", "start": "2024-05-01", " category ": "Work"},
+    {"task": "x", "due_date": "2024-06-01", "Start": "2024-05-01", "Category": "Work", "unknown": "ignored"},
+):
+    assert normalize(record) == ("x", False, "Medium", "2024-06-01", None, "Work", "2024-05-01"), record
+print("Header Aliases Passed!")
+
+# Test importing, with rejected rows listed by line
+print("Testing Import...")
+use_database("import.db")
+source = io.StringIO(
+    "Task,Priority,Due,Done\n"
+    "Write report,High,2024-06-01,x\n"
+    ",Low,,\n"
+    "Call Bob,Urgent,,\n"
+    "Book flights,low,2024-07-01,no\n"
+)
+report = import_tasks(source, "csv")
+assert (report.rows, report.imported) == (4, 2), report
+assert report.rejected == [(3, "missing task name"), (4, "unknown priority 'Urgent'")]
+assert [(task.name, task.done, task.priority) for task in get_tasks()] == [
+    ("Write report", True, "High"), ("Book flights", False, "Low"),
+]
+source = io.BytesIO(b'{"name": "from json", "done": true}\n\n[1, 2]\n{"name": \n{"name": "also", "category": "Home"}\n')
+report = import_tasks(source, "jsonl", batch_size=1)
+assert report.imported == 2 and [line for line, _ in report.rejected] == [3, 4], report.rejected
+assert "expected a JSON object" in report.rejected[0][1] and "invalid JSON" in report.rejected[1][1]
+try:
+    import_tasks(io.StringIO(""), "xml")
+except ValueError:
+    pass
+else:
+    raise AssertionError("an unknown format was accepted")
+print("Import Passed!")
+
+# Test that an export imports back unchanged
+print("Testing Round Trip...")
+use_database("export.db")
+add_task("Write report", "High", "2024-06-01", "first draft, then \"review\"", "Work", "2024-05-20")
+add_task("Café bills", "Low", None, "line one\nline two", "Home", None)
+add_task("Plan trip", "Medium", "2024-07-01", None, "Travel", "2024-06-15")
+update_tasks_status([1], True)
+exported = [fields(task) for task in get_tasks()]
+stream = export_tasks(fmt="csv")
+use_database("round_trip.db")
+report = import_tasks(stream, "csv")
+assert report.imported == 3 and not report.rejected
+assert [fields(task) for task in get_tasks()] == exported
+print("Round Trip Passed!")
+
+print("All import tests passed!")
@@ -0,0 +1,71 @@
+import datetime
+import os
+import tempfile
+
+from todo import ConnectionPool, add_task, get_task, get_tasks, init_db, materialize_occurrences, set_pool, set_recurrence
+from todo.recurrence import normalize_rule, occurrences, parse_rule
+
+# A scratch database, so the real todo.db is left alone
+set_pool(ConnectionPool(os.path.join(tempfile.mkdtemp(), "verify_recurrence.db")))
+init_db()
+today = datetime.date(2026, 10, 18)
+
+
+def occurrences_of(task_id):
+    return sorted(task.deadline for task in get_tasks() if task.series_id == task_id)
+
+
+# Test rule parsing
+print("Testing Rule Parsing...")
+assert normalize_rule("weekly") == "FREQ=WEEKLY"
+assert normalize_rule("FREQ=WEEKLY;BYDAY=TH,MO;INTERVAL=1") == "FREQ=WEEKLY;BYDAY=MO,TH"
+assert normalize_rule("none") is None
+for bad in ("FREQ=HOURLY", "FREQ=DAILY;COUNT=2;UNTIL=2026-01-01", "FREQ=DAILY;BYDAY=MO"):
+    try:
+        parse_rule(bad)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(f"{bad} was accepted")
+print("Rule Parsing Passed!")
+
+# Test expansion
+print("Testing Rule Expansion...")
+monthly = occurrences(parse_rule("FREQ=MONTHLY;BYMONTHDAY=31;COUNT=3"), datetime.date(2026, 1, 31))
+assert list(monthly) == [datetime.date(2026, 1, 31), datetime.date(2026, 3, 31), datetime.date(2026, 5, 31)]
+# Dates a month or year doesn't have are skipped
+assert list(occurrences(parse_rule("FREQ=YEARLY;COUNT=2"), datetime.date(2024, 2, 29))) == [
+    datetime.date(2024, 2, 29), datetime.date(2028, 2, 29)]
+assert list(occurrences(parse_rule("FREQ=MONTHLY;BYMONTHDAY=30;COUNT=2"), datetime.date(2026, 1, 30))) == [
+    datetime.date(2026, 1, 30), datetime.date(2026, 3, 30)]
+# A rule that can never match again ends instead of looping
+assert list(occurrences(parse_rule("FREQ=MONTHLY;INTERVAL=12;BYMONTHDAY=30"), datetime.date(2026, 2, 28))) == [
+    datetime.date(2026, 2, 28)]
+print("Rule Expansion Passed!")
+
+# Test materializing occurrences
+print("Testing Occurrences...")
+task_id = add_task("Water plants", "Low", today, "", "Home", None)
+created = set_recurrence(task_id, "weekly", today=today)
+assert created == 12, created
+assert occurrences_of(task_id)[0] == today + datetime.timedelta(weeks=1)
+assert get_task(task_id).recurrence == "FREQ=WEEKLY"
+# Running again creates nothing new
+assert materialize_occurrences(today + datetime.timedelta(days=90)) == 0
+# A later window only adds the dates it covers
+assert materialize_occurrences(today + datetime.timedelta(days=104)) == 2
+assert len(set(occurrences_of(task_id))) == len(occurrences_of(task_id)) == 14
+# Stopping the rule removes the upcoming occurrences
+set_recurrence(task_id, None, today=today)
+assert occurrences_of(task_id) == []
+print("Occurrences Passed!")
+
+# Test a template dated after the window: no duplicate of its own date
+print("Testing Template After Window...")
+task_id = add_task("Renew passport", "High", datetime.date(2027, 3, 1), "", "Home", None)
+assert set_recurrence(task_id, "weekly", today=today) == 0
+assert materialize_occurrences(datetime.date(2027, 3, 10)) == 1
+assert occurrences_of(task_id) == [datetime.date(2027, 3, 8)]
+print("Template After Window Passed!")
+
+print("All recurrence tests passed!")
@@ -0,0 +1,107 @@
+import datetime
+import os
+import tempfile
+
+from todo import (
+    ConnectionPool,
+    TaskFilter,
+    add_task,
+    archive_tasks,
+    delete_task,
+    edit_task,
+    get_task_counts,
+    init_db,
+    list_tasks_page,
+    search_tasks,
+    set_pool,
+    update_tasks_status,
+)
+
+# A scratch database, so the real todo.db is left alone
+set_pool(ConnectionPool(os.path.join(tempfile.mkdtemp(), "verify_search.db")))
+init_db()
+
+
+def add(name, note=""):
+    return add_task(name, "Medium", None, note, "General", None)
+
+
+def found(text):
+    return [task.name for task in search_tasks(text)]
+
+
+report = add("Write quarterly report", "numbers from finance")
+add("Call Bob", "about the report")
+add("Buy milk", "2% fat, not the 100_000 calorie one")
+add("Fix C# build", "see ticket AB-12")
+add('Read "Dune" AND OR NOT', "name:secret NEAR(a b) * ^col")
+add("東京の出張", "新幹線を予約する")
+
+# Test substring matching through the trigram index
+print("Testing Substring Search...")
+assert found("port") == ["Write quarterly report", "Call Bob"]
+assert found("QUARTER") == ["Write quarterly report"]
+# Every term must match, in the name or the note
+assert found("report finance") == ["Write quarterly report"]
+assert found("report milk") == []
+assert found("新幹線") == ["東京の出張"]
+print("Substring Search Passed!")
+
+# Test terms too short for trigrams, answered with LIKE
+print("Testing Short Terms...")
+assert found("C#") == ["Fix C# build"]
+assert found("Bo") == ["Call Bob"]
+assert found("東京") == ["東京の出張"]
+# LIKE wildcards typed by the user are matched literally
+assert found("2%") == ["Buy milk"]
+assert found("%") == ["Buy milk"]
+assert found("_") == ["Buy milk"]
+assert found("0_") == ["Buy milk"]
+# Short and indexed terms combine
+assert found("C# ticket") == ["Fix C# build"]
+assert found("Bo finance") == []
+print("Short Terms Passed!")
+
+# Test that FTS5 query syntax is taken literally
+print("Testing Quoting...")
+assert found('"Dune"') == ['Read "Dune" AND OR NOT']
+assert found("AND OR NOT") == ['Read "Dune" AND OR NOT']
+assert found("name:secret") == ['Read "Dune" AND OR NOT']
+assert found("NEAR(a b)") == ['Read "Dune" AND OR NOT']
+assert found("Dune*") == []
+assert found("^col") == ['Read "Dune" AND OR NOT']
+assert found('"') == ['Read "Dune" AND OR NOT']
+print("Quoting Passed!")
+
+# Test the order of results
+print("Testing Ranking...")
+# A hit in the name ranks above one in the note
+add("Budget notes", "the budget review")
+add("Review budget", "")
+assert found("review") == ["Review budget", "Budget notes"]
+# Open tasks come first, whatever their relevance
+update_tasks_status([report], True)
+assert found("report") == ["Call Bob", "Write quarterly report"]
+# Pages of a search continue in the same order
+tasks, after = list_tasks_page(TaskFilter(search="report"), None, 1)
+rest, end = list_tasks_page(TaskFilter(search="report"), after, 5)
+assert [task.name for task in tasks + rest] == found("report") and end is None
+assert get_task_counts(TaskFilter(search="report")) == (2, 1)
+print("Ranking Passed!")
+
+# Test that the index follows edits
+print("Testing Index Updates...")
+bob = [task.id for task in search_tasks("Bob")][0]
+edit_task(bob, "Call Alice", "High", None, "about the invoice", "General", None)
+assert found("Bob") == [] and found("Alice") == ["Call Alice"]
+assert found("report") == ["Write quarterly report"]
+delete_task(bob)
+assert found("Alice") == []
+# Archived tasks are searched with LIKE, having no index
+assert archive_tasks(30, now=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(days=31)) == 1
+assert found("quarterly") == []
+tasks, _ = list_tasks_page(TaskFilter(search="quarterly", archived=True), None, 10)
+assert [task.name for task in tasks] == ["Write quarterly report"]
+print("Index Updates Passed!")
+
+print("All search tests passed!")
@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Give up on another connection's write lock quickly, so the retries show
+os.environ["TODO_BUSY_TIMEOUT"] = "20"
+
+from todo import ConnectionPool, add_task, get_tasks, init_db, set_pool
+from todo.writer import Writer, set_writer
+
+# A scratch database, so the real todo.db is left alone
+path = os.path.join(tempfile.mkdtemp(), "verify_writer.db")
+pool = set_pool(ConnectionPool(path))
+init_db()
+
+
+def names():
+    return sorted(task.name for task in get_tasks())
+
+
+def add(name):
+    return add_task(name, "Low", None, "", "General", None)
+
+
+def fail(name):
+    add(name)
+    raise ValueError(name)
+
+
+# Test group commit
+print("Testing Group Commit...")
+writer = set_writer(Writer(pool, max_delay=0.05))
+futures = [writer.submit(add, f"task {i:03}") for i in range(100)]
+ids = [future.result() for future in futures]
+assert sorted(ids) == ids and len(set(ids)) == 100
+assert writer.operations == 100 and writer.batches < 10, writer.stats()
+# Helpers called from other threads are queued to the same writer
+threads = [threading.Thread(target=add, args=(f"thread {i}",)) for i in range(20)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+assert writer.operations == 120, writer.stats()
+print("Group Commit Passed!")
+
+# Test that one failing write doesn't take its group down
+print("Testing Failed Operation...")
+futures = [writer.submit(add, "kept 1"), writer.submit(fail, "rolled back"), writer.submit(add, "kept 2")]
+futures[0].result()
+futures[2].result()
+try:
+    futures[1].result()
+except ValueError:
+    pass
+else:
+    raise AssertionError("the failing operation succeeded")
+assert "kept 1" in names() and "kept 2" in names() and "rolled back" not in names()
+print("Failed Operation Passed!")
+
+# Test retries while another process holds the write lock
+print("Testing Busy Retries...")
+writer.close()
+writer = set_writer(Writer(pool, max_retries=5, retry_delay=0.05))
+other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+other.execute("BEGIN IMMEDIATE")
+threading.Timer(0.2, other.execute, ("COMMIT",)).start()
+add("after the lock")
+assert writer.retries > 0 and "after the lock" in names(), writer.stats()
+# A lock held past every retry is reported to the caller
+writer.close()
+writer = set_writer(Writer(pool, max_retries=1, retry_delay=0.01))
+other.execute("BEGIN IMMEDIATE")
+try:
+    add("never stored")
+except sqlite3.OperationalError:
+    pass
+else:
+    raise AssertionError("the write went through a held lock")
+finally:
+    other.execute("COMMIT")
+assert "never stored" not in names()
+print("Busy Retries Passed!")
+
+# Test that a closed writer is replaced, as after an API shutdown
+print("Testing Closed Writer...")
+writer.close()
+add("after close")
+assert "after close" in names()
+print("Closed Writer Passed!")
+
+print("All writer tests passed!")